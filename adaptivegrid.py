@@ -0,0 +1,77 @@
+'''
+* Adaptive frame-count grid.
+* Instead of spacing frame counts evenly, a sweep starts from a coarse grid
+* and then bisects every interval across which some policy's fault rate
+* changes by more than a tolerance, in rounds, until no interval does. Fault
+* rate curves are close to monotone in the frame count, so linearly
+* interpolating between the chosen points is then within the tolerance
+* everywhere, while the long flat tail is covered by a handful of points and
+* most simulations go to the knees and cliffs.
+*
+* Each round's midpoints are evaluated together, so they can still be fused
+* into shared passes and split across workers.
+*
+'''
+DEFAULT_INITIAL_POINTS = 32
+DEFAULT_TOLERANCE = 0.5  # percentage points of fault rate
+
+
+# Evenly spaced frame counts from 1 up to and including max_frames
+def initial_grid(max_frames, points=DEFAULT_INITIAL_POINTS):
+    points = max(2, min(points, max_frames))
+    step = (max_frames - 1) / (points - 1)
+
+    return sorted({1 + round(i * step) for i in range(points)})
+
+
+# Largest change in fault rate between two frame counts, over every policy
+def _change(fault_rates, policies, low, high):
+    return max(abs(fault_rates[(policy, high)] - fault_rates[(policy, low)]) for policy in policies)
+
+
+# Midpoints of the intervals that still change by more than tolerance, steepest first
+def refine(frame_counts, fault_rates, policies, tolerance=DEFAULT_TOLERANCE):
+    intervals = []
+
+    for low, high in zip(frame_counts, frame_counts[1:]):
+        change = _change(fault_rates, policies, low, high)
+
+        if high - low > 1 and change > tolerance:
+            intervals.append((change, (low + high) // 2))
+
+    intervals.sort(reverse=True)
+
+    return [midpoint for _, midpoint in intervals]
+
+
+# Chooses frame counts up to max_frames adaptively. evaluate takes a list of frame counts
+# and returns {(policy, frame_count): fault rate} for each of them. At most max_points
+# frame counts are evaluated. Returns the sorted frame counts and every fault rate
+def adaptive_sweep(
+    evaluate,
+    policies,
+    max_frames,
+    initial_points=DEFAULT_INITIAL_POINTS,
+    tolerance=DEFAULT_TOLERANCE,
+    max_points=None,
+):
+    # The coarse grid counts towards max_points too
+    if max_points is not None:
+        initial_points = min(initial_points, max_points)
+
+    frame_counts = initial_grid(max_frames, initial_points)[:max_points]
+    fault_rates = dict(evaluate(frame_counts))
+
+    while max_points is None or len(frame_counts) < max_points:
+        midpoints = refine(frame_counts, fault_rates, policies, tolerance)
+
+        if max_points is not None:
+            midpoints = midpoints[: max_points - len(frame_counts)]
+
+        if not midpoints:
+            break
+
+        fault_rates.update(evaluate(sorted(midpoints)))
+        frame_counts = sorted(frame_counts + midpoints)
+
+    return frame_counts, fault_rates
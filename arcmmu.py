@@ -0,0 +1,187 @@
+from collections import OrderedDict
+
+from mmu import MMU, free_frame_stack, to_list
+
+
+# Adaptive Replacement Cache (Megiddo & Modha). Resident pages are split between T1, pages
+# seen once recently, and T2, pages seen at least twice. B1 and B2 remember the pages recently
+# evicted from each, and a hit in one of them shifts the target size p of T1 towards the list
+# that would have kept the page - so a long scan only ever churns T1
+class ArcMMU(MMU):
+    def __init__(self, frames):
+        self.frames = frames
+        self.page_table = [None] * frames
+        self.dirty_bits = [0] * frames
+
+        # Resident pages mapped to their frame, ordered from least to most recently used
+        self.recent = OrderedDict()  # T1
+        self.frequent = OrderedDict()  # T2
+        # Ghosts of evicted pages, oldest first
+        self.recent_ghosts = OrderedDict()  # B1
+        self.frequent_ghosts = OrderedDict()  # B2
+
+        # Target size of T1
+        self.target = 0
+
+        self.free_frames = free_frame_stack(frames)
+
+        self.logical_time = 0
+
+        self.total_disk_reads = 0
+        self.total_disk_writes = 0
+        self.total_page_faults = 0
+
+        self.debug_mode = False
+
+    def set_debug(self):
+        self.debug_mode = True
+
+    def reset_debug(self):
+        self.debug_mode = False
+
+    # Evicts the LRU page of T1 or T2, as chosen by the target, into its ghost list, and
+    # returns the freed frame
+    def __replace(self, in_frequent_ghosts):
+        recent_size = len(self.recent)
+
+        if recent_size > 0 and (
+            recent_size > self.target or (in_frequent_ghosts and recent_size == self.target)
+        ):
+            page_number, frame_num = self.recent.popitem(last=False)
+            self.recent_ghosts[page_number] = None
+        else:
+            page_number, frame_num = self.frequent.popitem(last=False)
+            self.frequent_ghosts[page_number] = None
+
+        self._write_back(frame_num)
+
+        return frame_num
+
+    # Finds a frame for a page that missed, adapting the target and trimming the ghost lists
+    def __get_replaceable_frame(self, page_number):
+        recent_ghosts = self.recent_ghosts
+        frequent_ghosts = self.frequent_ghosts
+
+        if page_number in recent_ghosts:
+            self.target = min(
+                self.frames, self.target + max(len(frequent_ghosts) // len(recent_ghosts), 1)
+            )
+            del recent_ghosts[page_number]
+
+            return self.__replace(False)
+
+        if page_number in frequent_ghosts:
+            self.target = max(
+                0, self.target - max(len(recent_ghosts) // len(frequent_ghosts), 1)
+            )
+            del frequent_ghosts[page_number]
+
+            return self.__replace(True)
+
+        # A page seen for the first time - keep T1 + B1 and the whole directory within bounds
+        if len(self.recent) + len(recent_ghosts) == self.frames:
+            if len(self.recent) < self.frames:
+                recent_ghosts.popitem(last=False)
+
+                return self.__replace(False)
+
+            _, frame_num = self.recent.popitem(last=False)
+            self._write_back(frame_num)
+
+            return frame_num
+
+        if self.free_frames:
+            return self.free_frames.pop()
+
+        if len(self.recent) + len(self.frequent) + len(recent_ghosts) + len(frequent_ghosts) >= (
+            2 * self.frames
+        ):
+            frequent_ghosts.popitem(last=False)
+
+        return self.__replace(False)
+
+    # Simulates reading from page page_number, and writing to page_number if write is true
+    def __get_page(self, page_number, write):
+        self.logical_time += 1
+
+        frame_num = self.recent.pop(page_number, None)
+
+        if frame_num is None:
+            frame_num = self.frequent.get(page_number)
+
+        # On a hit, the page moves to the most recently used end of T2
+        if frame_num is not None:
+            self.frequent[page_number] = frame_num
+            self.frequent.move_to_end(page_number)
+
+            if write:
+                self.dirty_bits[frame_num] = 1
+
+            return
+
+        self.__load_page(page_number, write)
+
+    def __load_page(self, page_number, write):
+        # Pages remembered in a ghost list have been seen before, so they go straight to T2
+        seen_before = page_number in self.recent_ghosts or page_number in self.frequent_ghosts
+        frame_num = self.__get_replaceable_frame(page_number)
+
+        if self.debug_mode:
+            self._log_debug_message(
+                f"Replacing page {self.page_table[frame_num]} (frame {frame_num}) with page {page_number}..."
+            )
+
+        self.total_disk_reads += 1
+        self.total_page_faults += 1
+
+        self.page_table[frame_num] = page_number
+
+        if seen_before:
+            self.frequent[page_number] = frame_num
+        else:
+            self.recent[page_number] = frame_num
+
+        if write:
+            self.dirty_bits[frame_num] = 1
+
+    def process_batch(self, pages, writes):
+        recent = self.recent
+        frequent = self.frequent
+        dirty_bits = self.dirty_bits
+        logical_time = self.logical_time
+
+        for page_number, write in zip(to_list(pages), to_list(writes)):
+            logical_time += 1
+            frame_num = recent.pop(page_number, None)
+
+            if frame_num is not None:
+                frequent[page_number] = frame_num
+            else:
+                frame_num = frequent.get(page_number)
+
+                if frame_num is None:
+                    self.logical_time = logical_time
+                    self.__load_page(page_number, write)
+                    continue
+
+                frequent.move_to_end(page_number)
+
+            if write:
+                dirty_bits[frame_num] = 1
+
+        self.logical_time = logical_time
+
+    def read_memory(self, page_number):
+        self.__get_page(page_number=page_number, write=False)
+
+    def write_memory(self, page_number):
+        self.__get_page(page_number=page_number, write=True)
+
+    def get_total_disk_reads(self):
+        return self.total_disk_reads
+
+    def get_total_disk_writes(self):
+        return self.total_disk_writes
+
+    def get_total_page_faults(self):
+        return self.total_page_faults
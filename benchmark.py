@@ -0,0 +1,211 @@
+'''
+* Simulator throughput benchmarks.
+* Reports, for the bundled traces and a set of synthetic ones:
+*   - trace load time (text decode, and memory-mapped binary if converted)
+*   - accesses per second of each MMU class at several frame counts
+*   - end-to-end wall time of a frame-count sweep
+*
+* Results are written as JSON, tagged with the git revision, so runs from
+* different revisions can be compared with --compare.
+*
+* Usage: python benchmark.py [--traces gcc swim] [--frames 64 512 4096]
+*                            [--limit N] [--synthetic-size N] [--synthetic-pages N]
+*                            [--sweep-points N] [--workers N]
+*                            [--output FILE] [--compare FILE]
+*
+'''
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+
+from binarytrace import binary_path, load_trace
+from kernels import ACCELERATED
+from policies import OFFLINE_POLICIES, POLICIES
+from stackdistance import StackDistanceAnalyzer
+from sweep import make_jobs, run_sweep
+from synthetic import GENERATORS, generate
+from tracestream import DEFAULT_PAGE_SIZE, load_pages, page_offset_for
+
+TRACE_NAMES = ["bzip", "gcc", "sixpack", "swim"]
+SWEEP_TABLE_MULTIPLE = 1.2  # headroom over the unique page count, kept fixed so runs compare
+
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+
+    return result, time.perf_counter() - start
+
+
+def git_revision():
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return output.stdout.strip()
+
+
+def bench_trace_load(trace_fp):
+    (pages, writes), text_seconds = time_call(load_pages, trace_fp)
+    result = {"events": len(pages), "text_seconds": text_seconds, "binary_seconds": None}
+
+    if os.path.exists(binary_path(trace_fp)):
+        offset = page_offset_for(DEFAULT_PAGE_SIZE)
+        start = time.perf_counter()
+        addresses, _ = load_trace(binary_path(trace_fp))
+        # Include the page decode, as memsim.py and experiment.py do it on every load
+        _ = addresses >> offset
+        result["binary_seconds"] = time.perf_counter() - start
+
+    return (pages, writes), result
+
+
+def bench_mmus(pages, writes, frame_counts):
+    results = []
+
+    for policy, mmu_class in POLICIES.items():
+        for frames in frame_counts:
+            mmu = mmu_class(frames)
+            start = time.perf_counter()
+
+            # Offline policies' look-ahead pass is part of what they cost
+            if policy in OFFLINE_POLICIES:
+                mmu.set_trace(pages)
+
+            mmu.process_batch(pages, writes)
+            seconds = time.perf_counter() - start
+
+            rate = len(pages) / seconds if seconds > 0 else None
+
+            results.append(
+                {
+                    "policy": policy,
+                    "frames": frames,
+                    "seconds": seconds,
+                    "accesses_per_second": rate,
+                }
+            )
+
+            print(f"|   {policy:>8} {frames:>6} frames: {rate or 0:>12,.0f} accesses/s")
+
+    return results
+
+
+# Times a sweep shaped like experiment.py's - LRU from one stack-distance pass,
+# rand and clock replayed at each of `points` evenly spaced frame counts
+def bench_sweep(name, pages, writes, points, workers):
+    start = time.perf_counter()
+
+    analyzer = StackDistanceAnalyzer()
+    analyzer.process(pages.tolist(), writes.tolist())
+
+    max_table_size = math.ceil(analyzer.unique_pages * SWEEP_TABLE_MULTIPLE)
+    increment_size = max(1, math.ceil(max_table_size / points))
+    frame_counts = range(increment_size, max_table_size + increment_size, increment_size)
+
+    jobs = make_jobs(name, ["rand", "clock"], frame_counts)
+    list(run_sweep({name: (pages, writes)}, jobs, workers))
+
+    seconds = time.perf_counter() - start
+    print(f"|   sweep of {len(frame_counts)} frame counts: {seconds:.2f}s")
+
+    return {"points": len(frame_counts), "workers": workers, "seconds": seconds}
+
+
+def compare(results, baseline):
+    print(f"\ncomparing against {baseline.get('revision')}...")
+
+    for name, workload in results["workloads"].items():
+        if name not in baseline["workloads"]:
+            continue
+
+        old_workload = baseline["workloads"][name]
+        old_rates = {
+            (entry["policy"], entry["frames"]): entry["accesses_per_second"]
+            for entry in old_workload["mmus"]
+        }
+
+        for entry in workload["mmus"]:
+            old_rate = old_rates.get((entry["policy"], entry["frames"]))
+
+            if old_rate and entry["accesses_per_second"]:
+                ratio = entry["accesses_per_second"] / old_rate
+                print(f"| {name:>8} {entry['policy']:>8} {entry['frames']:>6} frames: {ratio:.2f}x")
+
+        if workload.get("sweep") and old_workload.get("sweep"):
+            ratio = old_workload["sweep"]["seconds"] / workload["sweep"]["seconds"]
+            print(f"| {name:>8} sweep: {ratio:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark simulator throughput")
+    parser.add_argument("--traces", nargs="*", default=TRACE_NAMES, help="bundled traces to run")
+    parser.add_argument("--frames", nargs="+", type=int, default=[64, 512, 4096])
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=200000,
+        help="accesses of each trace used for MMU throughput (default: 200000, 0 for all)",
+    )
+    parser.add_argument("--synthetic-size", type=int, default=200000)
+    parser.add_argument("--synthetic-pages", type=int, default=5000)
+    parser.add_argument(
+        "--sweep-points", type=int, default=10, help="frame counts per sweep, 0 to skip sweeps"
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "accelerated": ACCELERATED,
+        "workloads": {},
+    }
+
+    workloads = []
+
+    for name in args.traces:
+        print(f"\nloading {name}...")
+        (pages, writes), load = bench_trace_load("traces/" + name + ".trace.gz")
+        print(f"| {load['events']} events, text decode {load['text_seconds']:.2f}s")
+        workloads.append((name, pages, writes, {"load": load}))
+
+    for kind in GENERATORS:
+        (pages, writes), seconds = time_call(
+            generate, kind, args.synthetic_size, args.synthetic_pages
+        )
+        workloads.append((kind, pages, writes, {"generate_seconds": seconds}))
+
+    for name, pages, writes, workload in workloads:
+        print(f"\nbenchmarking {name}...")
+
+        limit = args.limit if args.limit > 0 else len(pages)
+        workload["mmus"] = bench_mmus(pages[:limit], writes[:limit], args.frames)
+
+        if args.sweep_points > 0:
+            workload["sweep"] = bench_sweep(name, pages, writes, args.sweep_points, args.workers)
+
+        results["workloads"][name] = workload
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+
+    print(f"\nresults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+'''
+* Compact binary trace format.
+* A text trace ("0041f7a0 R" per line, optionally gzipped) is converted once
+* into a packed file that can be memory-mapped on every later run:
+*
+*   header    16 bytes: magic b"MTRC", uint32 version, uint64 event count
+*   addresses uint32[count], little endian logical addresses
+*   writes    uint8[count], 1 for a write and 0 for a read
+*
+* Full addresses are kept rather than page numbers, so one file serves any
+* page size - the page array is a single vectorised shift away.
+*
+* Usage: python binarytrace.py traces/*.trace.gz
+*
+'''
+import gzip
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b"MTRC"
+VERSION = 1
+HEADER = struct.Struct("<4sIQ")
+BINARY_SUFFIX = ".bin"
+MAX_ADDRESS = 0xFFFFFFFF  # addresses are stored as uint32, so 64-bit traces stay as text
+
+
+# Returns the path a text trace is converted to, e.g. traces/gcc.trace.gz -> traces/gcc.trace.bin
+def binary_path(trace_path):
+    if trace_path.endswith(".gz"):
+        trace_path = trace_path[:-3]
+
+    return trace_path + BINARY_SUFFIX
+
+
+def is_binary_trace(path):
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+
+    return open(path, "r")
+
+
+def convert_trace(src_path, dst_path):
+    addresses = []
+    writes = []
+
+    with _open_text(src_path) as file:
+        for line_number, trace_line in enumerate(file, start=1):
+            trace_cmd = trace_line.split()
+
+            if len(trace_cmd) == 0:
+                continue
+
+            if len(trace_cmd) != 2 or trace_cmd[1] not in ("R", "W"):
+                raise ValueError(f"Badly formatted file. Error on line {line_number}")
+
+            address = int(trace_cmd[0], 16)
+
+            if not 0 <= address <= MAX_ADDRESS:
+                raise ValueError(
+                    f"Address on line {line_number} doesn't fit the binary format's 32 bits"
+                )
+
+            addresses.append(address)
+            writes.append(trace_cmd[1] == "W")
+
+    write_trace(dst_path, np.array(addresses, dtype=np.uint32), np.array(writes, dtype=np.uint8))
+
+    return len(addresses)
+
+
+def write_trace(path, addresses, writes):
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(addresses)))
+        file.write(np.asarray(addresses, dtype="<u4").tobytes())
+        file.write(np.asarray(writes, dtype=np.uint8).tobytes())
+
+
+# Memory-maps a binary trace, returning (addresses, writes) views over the file
+def load_trace(path):
+    with open(path, "rb") as file:
+        magic, version, count = HEADER.unpack(file.read(HEADER.size))
+
+    if magic != MAGIC:
+        raise ValueError(f"'{path}' is not a binary trace")
+    if version != VERSION:
+        raise ValueError(f"'{path}' has unsupported trace version {version}")
+
+    if count == 0:
+        return np.zeros(0, dtype="<u4"), np.zeros(0, dtype=np.uint8)
+
+    addresses = np.memmap(path, dtype="<u4", mode="r", offset=HEADER.size, shape=(count,))
+    writes = np.memmap(
+        path, dtype=np.uint8, mode="r", offset=HEADER.size + 4 * count, shape=(count,)
+    )
+
+    return addresses, writes
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python binarytrace.py tracefile [tracefile ...]")
+        return
+
+    for src_path in sys.argv[1:]:
+        dst_path = binary_path(src_path)
+
+        try:
+            events = convert_trace(src_path, dst_path)
+        except ValueError as error:
+            print(f"{src_path}: {error}")
+            continue
+
+        print(f"{src_path} -> {dst_path} ({events} events)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,24 @@
-from mmu import MMU
+from mmu import MMU, to_list
 
 class ClockMMU(MMU):
     def __init__(self, frames):
         self.frames = frames
         self.page_table = [None] * frames
-        self.dirty_bits = [0] * frames
+        # Use and dirty bits are one byte per frame, so the hand can scan them with bytearray.find
+        self.dirty_bits = bytearray(frames)
+        # page number -> frame index for every resident page
+        self.page_frames = {}
         
         self.disk_reads = 0
         self.disk_writes = 0
         self.page_faults = 0
         self.debug_mode = False
         
-        self.use_bits = [0] * frames
+        self.use_bits = bytearray(frames)
         self.frame_pointer = 0
+
+        # Accesses so far, the clock a disk model times requests by
+        self.logical_time = 0
         
     def set_debug(self):
         self.debug_mode = True
@@ -26,6 +32,53 @@ class ClockMMU(MMU):
     def write_memory(self, page_number):
         self.__get_page(page_number, True)
 
+    def process_batch(self, pages, writes):
+        # Debug output is produced per access, so keep the per-access path when debugging
+        if self.debug_mode:
+            return super().process_batch(pages, writes)
+
+        page_frames = self.page_frames
+        use_bits = self.use_bits
+        dirty_bits = self.dirty_bits
+        logical_time = self.logical_time
+
+        for page_number, write in zip(to_list(pages), to_list(writes)):
+            logical_time += 1
+            page_index = page_frames.get(page_number)
+
+            if page_index is None:
+                self.logical_time = logical_time
+                self.__load_page(page_number, write)
+                continue
+
+            use_bits[page_index] = 1
+
+            if write:
+                dirty_bits[page_index] = 1
+
+        self.logical_time = logical_time
+
+    def is_resident(self, page_number):
+        return page_number in self.page_frames
+
+    # Marks up to count dirty pages clean from the window frames ahead of the hand, skipping any
+    # whose use bit will save them - for a page cleaner that writes them back ahead of time.
+    # Returns how many it cleaned
+    def clean_pages(self, count, window):
+        cleaned = 0
+
+        for step in range(min(window, self.frames)):
+            if cleaned >= count:
+                break
+
+            frame_num = (self.frame_pointer + step) % self.frames
+
+            if self.use_bits[frame_num] == 0 and self.dirty_bits[frame_num] == 1:
+                self.dirty_bits[frame_num] = 0
+                cleaned += 1
+
+        return cleaned
+
     def get_total_disk_reads(self):
         return self.disk_reads
 
@@ -40,17 +93,21 @@ class ClockMMU(MMU):
             print(f"{message}")
     
     def __get_page(self, page_number, write):
-        if (write == True):
-            self.__print_debug("write_memory: page no " + str(page_number))
-        elif (write == False):
-            self.__print_debug("read_memory: page no " + str(page_number))
+        self.logical_time += 1
+
+        # Messages are only built when they'll be printed
+        if self.debug_mode:
+            if (write == True):
+                self.__print_debug("write_memory: page no " + str(page_number))
+            elif (write == False):
+                self.__print_debug("read_memory: page no " + str(page_number))
         
-        page_index = 0
+        # check if page in table
+        page_index = self.page_frames.get(page_number)
         
-        try:
-            # check if page in table
-            page_index = self.page_table.index(page_number)
-            self.__print_debug("page in table")
+        if page_index is not None:
+            if self.debug_mode:
+                self.__print_debug("page in table")
             # set use bit
             self.use_bits[page_index] = 1
             
@@ -58,35 +115,70 @@ class ClockMMU(MMU):
             if (write == True):
                 self.dirty_bits[page_index] = 1
             
-        except ValueError:
-            self.__print_debug("page not in table")
-            self.__increment_page_fault_count()
-            self. __set_frame_to_replace()
-            self.__write_if_dirty_page()
-
-            # read page in to frame
-            self.page_table[self.frame_pointer] = page_number
-            # increment disk reads
-            self.disk_reads += 1
-            # set use bit
-            self.use_bits[self.frame_pointer] = 1
-            
-            # if writing, set dirty bit
-            if (write == True):
-                self.dirty_bits[self.frame_pointer] = 1
-            
-            # move frame pointer to next frame
-            self.__increment_frame_pointer()    
+        else:
+            if self.debug_mode:
+                self.__print_debug("page not in table")
+            self.__load_page(page_number, write)
+    
+    def __load_page(self, page_number, write):
+        self.__increment_page_fault_count()
+        self. __set_frame_to_replace()
+        self.__write_if_dirty_page()
+
+        # read page in to frame
+        if self.page_table[self.frame_pointer] is not None:
+            del self.page_frames[self.page_table[self.frame_pointer]]
+        self.page_table[self.frame_pointer] = page_number
+        self.page_frames[page_number] = self.frame_pointer
+        # increment disk reads
+        self.disk_reads += 1
+        # set use bit
+        self.use_bits[self.frame_pointer] = 1
+        
+        # if writing, set dirty bit
+        if (write == True):
+            self.dirty_bits[self.frame_pointer] = 1
+
+        if self.disk is not None:
+            self.disk.read(page_number, self.logical_time)
+        
+        # move frame pointer to next frame
+        self.__increment_frame_pointer()    
     
     def __increment_frame_pointer(self):
             self.frame_pointer = (self.frame_pointer + 1) % self.frames
     
     def __set_frame_to_replace(self):
         # cycle through frames until we find a frame with use bit set to 0
-        # if use bit has been set to 1, set to 0 and move to next frame
-        while (self.use_bits[self.frame_pointer] == 1):
-            self.use_bits[self.frame_pointer] = 0
-            self.__increment_frame_pointer()
+        # every use bit passed over on the way is cleared, all in one slice assignment
+        pointer = self.frame_pointer
+
+        if self.use_bits[pointer] == 0:
+            if self.instruments is not None:
+                self.instruments.observe("eviction_scan_length", 0)
+            return
+
+        next_free = self.use_bits.find(0, pointer)
+
+        if next_free >= 0:
+            self.use_bits[pointer:next_free] = bytes(next_free - pointer)
+        else:
+            # no clear bit before the end of the ring - clear the tail and wrap around
+            self.use_bits[pointer:] = bytes(self.frames - pointer)
+            next_free = self.use_bits.find(0, 0, pointer)
+
+            if next_free >= 0:
+                self.use_bits[:next_free] = bytes(next_free)
+            else:
+                # every bit was set, so the hand comes all the way back to where it started
+                self.use_bits[:pointer] = bytes(pointer)
+                next_free = pointer
+
+        if self.instruments is not None:
+            # frames whose use bit was cleared on the way - all of them if the hand went full circle
+            self.instruments.observe("eviction_scan_length", (next_free - pointer - 1) % self.frames + 1)
+
+        self.frame_pointer = next_free
         
     def __write_if_dirty_page(self):
         # check if page dirty
@@ -94,7 +186,11 @@ class ClockMMU(MMU):
         if (self.dirty_bits[self.frame_pointer] == 1):
             self.disk_writes += 1
             self.dirty_bits[self.frame_pointer] = 0
+
+            if self.disk is not None:
+                self.disk.write_back(self.page_table[self.frame_pointer], self.logical_time)
     
     def __increment_page_fault_count(self):
-        self.__print_debug("**page fault**")
+        if self.debug_mode:
+            self.__print_debug("**page fault**")
         self.page_faults += 1
\ No newline at end of file
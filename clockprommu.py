@@ -0,0 +1,301 @@
+from mmu import MMU, free_frame_stack, to_list
+
+HOT = 0  # resident, with a short reuse distance
+COLD = 1  # resident, in its test period
+TEST = 2  # evicted, but still in its test period - only its page number is kept
+
+INITIAL_COLD_FRACTION = 0.01  # starting share of the frames for cold pages, adapted as it runs
+
+
+# CLOCK-Pro (Jiang, Chen & Zhang) - LIRS approximated with clock hands. Resident hot and cold
+# pages and non-resident test pages share one clock, newest pages inserted just behind the
+# hot hand. The cold hand evicts unreferenced cold pages, keeping them as test pages, and
+# promotes referenced ones to hot. The hot hand demotes unreferenced hot pages to cold and
+# ends the test period of test pages it passes. A test page that's referenced again returns
+# as a hot page and earns cold pages more frames, and one whose test period ends unreferenced
+# takes a frame back from them.
+#
+# Resident cold pages are also linked into a ring of their own, in clock order, so the cold
+# hand jumps from one to the next instead of walking past every hot and test page between
+# them. Pages only turn cold just behind the hot hand - when inserted or demoted - so keeping
+# track of the first cold page at or after the hot hand is enough to link them in in order
+class ClockProMMU(MMU):
+    def __init__(self, frames):
+        self.frames = frames
+        self.page_table = [None] * frames
+        self.dirty_bits = [0] * frames
+
+        self.free_frames = free_frame_stack(frames)
+
+        # The clock, as a circular doubly linked list of page numbers
+        self.next_page = {}
+        self.prev_page = {}
+        self.hand_hot = None
+        self.hand_test = None
+
+        # The resident cold pages, as a circular doubly linked list in clock order. The cold
+        # hand always points at one of them, or is None when there are none
+        self.next_cold = {}
+        self.prev_cold = {}
+        self.hand_cold = None
+        # The first cold page at or after the hot hand, where newly cold pages are linked in
+        self.cold_after_hot = None
+
+        self.status = {}
+        # Resident page -> frame, and the reference bit of each resident page
+        self.page_frames = {}
+        self.referenced = {}
+
+        self.hot_count = 0
+        self.cold_count = 0
+        self.test_count = 0
+        # Target number of resident cold pages
+        self.cold_target = max(1, int(frames * INITIAL_COLD_FRACTION))
+
+        self.logical_time = 0
+
+        self.total_disk_reads = 0
+        self.total_disk_writes = 0
+        self.total_page_faults = 0
+
+        self.debug_mode = False
+
+    def set_debug(self):
+        self.debug_mode = True
+
+    def reset_debug(self):
+        self.debug_mode = False
+
+    # Adds a page to the clock just behind the hot hand, the last place any hand will reach
+    def __insert(self, page_number):
+        if self.hand_hot is None:
+            self.next_page[page_number] = page_number
+            self.prev_page[page_number] = page_number
+            self.hand_hot = self.hand_test = page_number
+            return
+
+        after = self.hand_hot
+        before = self.prev_page[after]
+        self.next_page[before] = page_number
+        self.prev_page[page_number] = before
+        self.next_page[page_number] = after
+        self.prev_page[after] = page_number
+
+    # Takes a page off the clock, moving any hand pointing at it on to the next page
+    def __remove(self, page_number):
+        after = self.next_page.pop(page_number)
+        before = self.prev_page.pop(page_number)
+
+        if after == page_number:
+            self.hand_hot = self.hand_test = None
+            return
+
+        self.next_page[before] = after
+        self.prev_page[after] = before
+
+        if self.hand_hot == page_number:
+            self.hand_hot = after
+        if self.hand_test == page_number:
+            self.hand_test = after
+
+    # Links a page that's just turned cold, just behind the hot hand, into the cold ring
+    def __add_cold(self, page_number):
+        after = self.cold_after_hot
+
+        if after is None:
+            self.next_cold[page_number] = page_number
+            self.prev_cold[page_number] = page_number
+            self.hand_cold = self.cold_after_hot = page_number
+            return
+
+        before = self.prev_cold[after]
+        self.next_cold[before] = page_number
+        self.prev_cold[page_number] = before
+        self.next_cold[page_number] = after
+        self.prev_cold[after] = page_number
+
+    # Unlinks a page that's no longer cold, moving any pointer at it on to the next cold page
+    def __remove_cold(self, page_number):
+        after = self.next_cold.pop(page_number)
+        before = self.prev_cold.pop(page_number)
+
+        if after == page_number:
+            self.hand_cold = self.cold_after_hot = None
+            return
+
+        self.next_cold[before] = after
+        self.prev_cold[after] = before
+
+        if self.hand_cold == page_number:
+            self.hand_cold = after
+        if self.cold_after_hot == page_number:
+            self.cold_after_hot = after
+
+    def __end_test(self, page_number):
+        self.__remove(page_number)
+        del self.status[page_number]
+        self.test_count -= 1
+
+    # Demotes an unreferenced hot page, clears the reference bit of a referenced one, and
+    # ends the test period of a test page, which passed unreferenced, so cold pages lose a frame
+    def __run_hand_hot(self):
+        page_number = self.hand_hot
+        self.hand_hot = self.next_page[page_number]
+        status = self.status[page_number]
+
+        if status == HOT:
+            if self.referenced[page_number]:
+                self.referenced[page_number] = False
+            else:
+                self.status[page_number] = COLD
+                self.hot_count -= 1
+                self.cold_count += 1
+                self.__add_cold(page_number)
+        elif status == COLD:
+            self.cold_after_hot = self.next_cold[page_number]
+        else:
+            self.__end_test(page_number)
+            self.cold_target = max(1, self.cold_target - 1)
+
+    # Ends the oldest test period, which passed without a reference, so cold pages lose a frame
+    def __run_hand_test(self):
+        while self.test_count > 0:
+            page_number = self.hand_test
+            self.hand_test = self.next_page[page_number]
+
+            if self.status[page_number] == TEST:
+                self.__end_test(page_number)
+                self.cold_target = max(1, self.cold_target - 1)
+                return
+
+    # Visits the next resident cold page - promoting it if it was referenced, otherwise
+    # evicting it and returning its frame
+    def __run_hand_cold(self):
+        page_number = self.hand_cold
+        self.__remove_cold(page_number)
+
+        if self.referenced[page_number]:
+            # Referenced during its test period, so its reuse distance is short
+            self.referenced[page_number] = False
+            self.status[page_number] = HOT
+            self.cold_count -= 1
+            self.hot_count += 1
+            return None
+
+        frame_num = self.page_frames.pop(page_number)
+        del self.referenced[page_number]
+        self.status[page_number] = TEST
+        self.cold_count -= 1
+        self.test_count += 1
+
+        if self.test_count > self.frames:
+            self.__run_hand_test()
+
+        self._write_back(frame_num)
+
+        return frame_num
+
+    # Returns a free frame, or runs the hands until a cold page is evicted
+    def __get_replaceable_frame(self):
+        if self.free_frames:
+            return self.free_frames.pop()
+
+        while True:
+            # Keep hot pages within the frames the cold ones leave them
+            while self.cold_count == 0 or self.hot_count > self.frames - self.cold_target:
+                self.__run_hand_hot()
+
+            frame_num = self.__run_hand_cold()
+
+            if frame_num is not None:
+                return frame_num
+
+    # Simulates reading from page page_number, and writing to page_number if write is true
+    def __get_page(self, page_number, write):
+        self.logical_time += 1
+
+        frame_num = self.page_frames.get(page_number)
+
+        if frame_num is not None:
+            self.referenced[page_number] = True
+
+            if write:
+                self.dirty_bits[frame_num] = 1
+
+            return
+
+        self.__load_page(page_number, write)
+
+    def __load_page(self, page_number, write):
+        in_test = self.status.get(page_number) == TEST
+
+        if in_test:
+            # Re-referenced while in its test period - cold pages deserved more room
+            self.cold_target = min(self.frames, self.cold_target + 1)
+
+        frame_num = self.__get_replaceable_frame()
+
+        if self.debug_mode:
+            self._log_debug_message(
+                f"Replacing page {self.page_table[frame_num]} (frame {frame_num}) with page {page_number}..."
+            )
+
+        self.total_disk_reads += 1
+        self.total_page_faults += 1
+
+        # The hands may have ended its test period while making room
+        if self.status.get(page_number) == TEST:
+            self.__end_test(page_number)
+
+        self.page_table[frame_num] = page_number
+        self.page_frames[page_number] = frame_num
+        self.referenced[page_number] = False
+        self.__insert(page_number)
+
+        if in_test:
+            self.status[page_number] = HOT
+            self.hot_count += 1
+        else:
+            self.status[page_number] = COLD
+            self.cold_count += 1
+            self.__add_cold(page_number)
+
+        if write:
+            self.dirty_bits[frame_num] = 1
+
+    def process_batch(self, pages, writes):
+        page_frames = self.page_frames
+        referenced = self.referenced
+        dirty_bits = self.dirty_bits
+        logical_time = self.logical_time
+
+        for page_number, write in zip(to_list(pages), to_list(writes)):
+            logical_time += 1
+            frame_num = page_frames.get(page_number)
+
+            if frame_num is None:
+                self.logical_time = logical_time
+                self.__load_page(page_number, write)
+                continue
+
+            referenced[page_number] = True
+
+            if write:
+                dirty_bits[frame_num] = 1
+
+        self.logical_time = logical_time
+
+    def read_memory(self, page_number):
+        self.__get_page(page_number=page_number, write=False)
+
+    def write_memory(self, page_number):
+        self.__get_page(page_number=page_number, write=True)
+
+    def get_total_disk_reads(self):
+        return self.total_disk_reads
+
+    def get_total_disk_writes(self):
+        return self.total_disk_writes
+
+    def get_total_page_faults(self):
+        return self.total_page_faults
@@ -0,0 +1,217 @@
+'''
+* Disk latency model.
+* A DiskModel attached to an MMU with set_disk() turns its page faults and
+* write-backs into timed disk requests, and adds up how long the program
+* stalls waiting on them. Simulated time advances by access_ns for every
+* memory access plus every stall, so the disk sees requests at the times
+* they'd really be made.
+*
+* The disk serves requests first come first served, `channels` at a time,
+* with at most `queue_depth` outstanding:
+*   - a page fault reads synchronously - the program stalls until the read
+*     completes, including any time it spends queued behind other requests
+*   - a dirty eviction writes back asynchronously, only stalling the program
+*     if the queue is full
+*   - a page cleaner, off unless cleaner_interval_ns is set, wakes that
+*     often and writes back up to cleaner_batch dirty pages among the
+*     cleaner_window share of frames nearest eviction, so they're clean by
+*     the time they're evicted. It never waits for room in the queue
+*   - with readahead set, two page faults in a row with the same stride (of
+*     at most max_stride pages) prefetch the next `readahead` pages along it
+*     into a buffer of prefetch_buffer pages. A fault on a prefetched page
+*     only waits for that read to finish
+*
+* Page fault and write-back counts are left to the MMU as before. Pages the
+* cleaner wrote are clean when evicted, so the MMU's write-backs fall by the
+* cleaner's writes - all disk writes are the two added together. Likewise a
+* fault on a prefetched page reads nothing more, so all disk reads are the
+* MMU's, less the prefetch hits, plus the prefetch reads.
+*
+'''
+import heapq
+from collections import OrderedDict
+
+DISK_DEFAULTS = {
+    "access_ns": 100.0,  # time per memory access between faults
+    "read_ns": 100000.0,
+    "write_ns": 100000.0,
+    "channels": 1,  # requests served at once
+    "queue_depth": 32,  # requests outstanding before asynchronous writers must wait
+    "cleaner_interval_ns": 0.0,  # 0 for no page cleaner, the default
+    "cleaner_batch": 16,
+    "cleaner_window": 0.1,  # share of the frames, nearest eviction, the cleaner looks at
+    "readahead": 0,  # pages prefetched along a detected stride, 0 for no prefetching
+    "max_stride": 8,  # largest stride, in pages, the prefetcher follows
+    "prefetch_buffer": 256,  # prefetched pages kept until they're faulted on
+}
+
+
+class DiskModel:
+    # config overrides any of DISK_DEFAULTS
+    def __init__(self, **config):
+        unknown = set(config) - set(DISK_DEFAULTS)
+
+        if unknown:
+            raise ValueError(f"Unknown disk settings: {', '.join(sorted(unknown))}")
+
+        self.config = {**DISK_DEFAULTS, **config}
+
+        if self.config["channels"] < 1 or self.config["queue_depth"] < 1:
+            raise ValueError("Disk channels and queue depth must be at least 1")
+
+        self.mmu = None
+
+        # When each channel is next free, and when each outstanding request completes
+        self.channels = [0.0] * self.config["channels"]
+        self.completions = []
+
+        self.next_clean = self.config["cleaner_interval_ns"]
+
+        # The last page fault and the stride that led to it
+        self.last_fault = None
+        self.last_stride = None
+        # Prefetched page -> when its read completes, oldest first
+        self.prefetched = OrderedDict()
+
+        self.reads = 0
+        self.writes = 0
+        self.cleaner_writes = 0
+        self.prefetch_reads = 0
+        self.prefetch_hits = 0
+
+        self.stall_ns = 0.0
+        self.read_stall_ns = 0.0
+        self.queue_stall_ns = 0.0
+
+    # Called by MMU.set_disk(). The page cleaner and prefetcher use the MMU's is_resident() and
+    # clean_pages()
+    def attach(self, mmu):
+        self.mmu = mmu
+
+    # Simulated time at the given access
+    def __now(self, access_time):
+        return access_time * self.config["access_ns"] + self.stall_ns
+
+    # Forgets requests that completed by now, returning how many are still outstanding
+    def __outstanding(self, now):
+        completions = self.completions
+
+        while completions and completions[0] <= now:
+            heapq.heappop(completions)
+
+        return len(completions)
+
+    # Queues a request made at now, returning when it completes
+    def __submit(self, now, latency):
+        done = max(now, self.channels[0]) + latency
+        heapq.heapreplace(self.channels, done)
+        heapq.heappush(self.completions, done)
+
+        return done
+
+    # Stalls until the queue has room, returning the time it does
+    def __wait_for_room(self, now):
+        if self.__outstanding(now) < self.config["queue_depth"]:
+            return now
+
+        wait = self.completions[0] - now
+        self.stall_ns += wait
+        self.queue_stall_ns += wait
+
+        return now + wait
+
+    # Runs the page cleaner once for every wake-up due by now, as a single pass
+    def __clean(self, now):
+        interval = self.config["cleaner_interval_ns"]
+
+        if interval <= 0 or now < self.next_clean:
+            return
+
+        wake_ups = int((now - self.next_clean) // interval) + 1
+        wake_time = self.next_clean + (wake_ups - 1) * interval
+        self.next_clean += wake_ups * interval
+
+        room = self.config["queue_depth"] - self.__outstanding(wake_time)
+        window = max(1, int(self.mmu.frames * self.config["cleaner_window"]))
+        cleaned = self.mmu.clean_pages(min(room, wake_ups * self.config["cleaner_batch"]), window)
+
+        for _ in range(cleaned):
+            self.__submit(wake_time, self.config["write_ns"])
+
+        self.cleaner_writes += cleaned
+
+    # Prefetches along the stride of the last two faults, if they had the same one
+    def __prefetch(self, page_number, now):
+        config = self.config
+        stride = None if self.last_fault is None else page_number - self.last_fault
+
+        if (
+            config["readahead"] > 0
+            and stride
+            and stride == self.last_stride
+            and abs(stride) <= config["max_stride"]
+        ):
+            for step in range(1, config["readahead"] + 1):
+                target = page_number + stride * step
+
+                if target < 0 or target in self.prefetched or self.mmu.is_resident(target):
+                    continue
+
+                # Prefetches are dropped rather than wait for room
+                if self.__outstanding(now) >= config["queue_depth"]:
+                    break
+
+                self.prefetched[target] = self.__submit(now, config["read_ns"])
+                self.prefetch_reads += 1
+
+                if len(self.prefetched) > config["prefetch_buffer"]:
+                    self.prefetched.popitem(last=False)
+
+        self.last_fault = page_number
+        self.last_stride = stride
+
+    # A dirty page evicted at the given access is written back without waiting for it
+    def write_back(self, page_number, access_time):
+        now = self.__now(access_time)
+        self.__clean(now)
+
+        now = self.__wait_for_room(now)
+        self.__submit(now, self.config["write_ns"])
+        self.writes += 1
+
+    # A page fault at the given access, which stalls until the page has been read
+    def read(self, page_number, access_time):
+        now = self.__now(access_time)
+        self.__clean(now)
+
+        done = self.prefetched.pop(page_number, None)
+
+        if done is not None:
+            self.prefetch_hits += 1
+        else:
+            now = self.__wait_for_room(now)
+            done = self.__submit(now, self.config["read_ns"])
+            self.reads += 1
+
+        wait = max(0.0, done - now)
+        self.stall_ns += wait
+        self.read_stall_ns += wait
+
+        self.__prefetch(page_number, now + wait)
+
+    # Simulated run time of the given number of accesses, in nanoseconds
+    def elapsed_ns(self, accesses):
+        return accesses * self.config["access_ns"] + self.stall_ns
+
+    def to_dict(self, accesses):
+        return {
+            "reads": self.reads,
+            "writes": self.writes,
+            "cleaner_writes": self.cleaner_writes,
+            "prefetch_reads": self.prefetch_reads,
+            "prefetch_hits": self.prefetch_hits,
+            "stall_ns": self.stall_ns,
+            "read_stall_ns": self.read_stall_ns,
+            "queue_stall_ns": self.queue_stall_ns,
+            "elapsed_ns": self.elapsed_ns(accesses),
+        }
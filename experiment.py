@@ -1,68 +1,83 @@
-import gzip
+import argparse
+import os
 import numpy as np
 import math
 import matplotlib.pyplot as plt
 import json
-from clockmmu import ClockMMU
-from lrummu import LruMMU
-from randmmu import RandMMU
+from binarytrace import binary_path, load_trace
+from tracestream import DEFAULT_PAGE_SIZE, load_pages, page_offset_for
+from stackdistance import StackDistanceAnalyzer
+from policies import POLICIES, SEEDED_POLICIES
+from sweep import average_results, make_jobs, run_sweep
+from instrumentation import Instruments, profiled
+from adaptivegrid import DEFAULT_INITIAL_POINTS, DEFAULT_TOLERANCE, adaptive_sweep
+from resultcache import DEFAULT_CACHE_FP, ResultCache, trace_digest
+from traceanalytics import frame_limit, trace_profile
 
-PAGE_OFFSET = 12  # page is 2^12 = 4KB
 MAX_INCREMENTS = (
     1000  # Maximum number of increments (of cache sizes) that each trace will run
 )
-FRAME_TABLE_MULTIPLE = 1.2  # The multiple that determines any "extra" space in the maximum frame table size
-DATA_FP = "data.json"
-FRAME_MIN = 100
+DEFAULT_POLICIES = ["rand", "lru", "clock", "arc", "2q", "lirs", "clockpro", "opt"]
 
 
 class Trace:
-    def __init__(self, name, traces):
+    # pages holds the page number of each access and writes is true where the access is a write
+    def __init__(self, name, pages, writes, policies=DEFAULT_POLICIES):
         self.name = name
-        self.traces = traces
+        self.pages = pages
+        self.writes = writes
+        self.policies = list(policies)
         self.increments = []
-        self.rand_results = []
-        self.lru_results = []
-        self.clock_results = []
+        self.results = {policy: [] for policy in self.policies}
+        self.lru_analyzer = None
+        self.digest = None
+        self.profile = None
 
     def NumMemoryAccesses(self):
-        return len(self.traces)
+        return len(self.pages)
 
     def UniqueFrames(self):
-        return len(np.unique(self.traces[0:, 0]))
+        if self.profile is None:
+            return len(np.unique(self.pages))
 
-    def collect_results(self, frame_count):
-        rand = RandMMU(frame_count)
-        lru = LruMMU(frame_count)
-        clock = ClockMMU(frame_count)
+        return self.profile["footprint"]
 
-        # Perform all the memory reads/writes for the current trace with the current frame count
-        for trace_cmd in self.traces:
-            if trace_cmd[1] == "R":
-                rand.read_memory(trace_cmd[0])
-                lru.read_memory(trace_cmd[0])
-                clock.read_memory(trace_cmd[0])
-            elif trace_cmd[1] == "W":
-                rand.write_memory(trace_cmd[0])
-                lru.write_memory(trace_cmd[0])
-                clock.write_memory(trace_cmd[0])
+    # Hashes the trace and reads its analytics profile, computing and caching it on first use
+    def analyze(self, page_size=DEFAULT_PAGE_SIZE):
+        self.digest = trace_digest(self.pages, self.writes)
+        self.profile = trace_profile(self.name, self.pages, self.writes, self.digest, page_size)
 
-        rand_fault_rate = rand.get_total_page_faults() / self.NumMemoryAccesses() * 100
-        lru_fault_rate = lru.get_total_page_faults() / self.NumMemoryAccesses() * 100
-        clock_fault_rate = (
-            clock.get_total_page_faults() / self.NumMemoryAccesses() * 100
-        )
+    # LRU results for every frame count come from a single stack-distance pass over the trace
+    def analyze_lru(self):
+        self.lru_analyzer = StackDistanceAnalyzer()
+        self.lru_analyzer.process(self.pages.tolist(), self.writes.tolist())
 
-        self.rand_results.append(rand_fault_rate)
-        self.lru_results.append(lru_fault_rate)
-        self.clock_results.append(clock_fault_rate)
+    # Policies that have to be simulated, rather than read off the stack-distance curve
+    def replayed_policies(self):
+        return [policy for policy in self.policies if policy != "lru"]
 
-        trace.increments.append(frame_count)
+    def lru_fault_rate(self, frame_count):
+        if self.lru_analyzer is None:
+            self.analyze_lru()
+
+        return self.lru_analyzer.get_total_page_faults(frame_count) / self.NumMemoryAccesses() * 100
+
+    # fault_rates maps (policy, frame_count) to the page fault rate of each replayed policy,
+    # and of lru where it's already known
+    def record_results(self, frame_count, fault_rates):
+        for policy in self.policies:
+            if (policy, frame_count) in fault_rates:
+                fault_rate = fault_rates[(policy, frame_count)]
+            else:
+                fault_rate = self.lru_fault_rate(frame_count)
+
+            self.results[policy].append(fault_rate)
+
+        self.increments.append(frame_count)
 
     def plot_results(self):
-        plt.plot(self.increments, self.rand_results, label="rand")
-        plt.plot(self.increments, self.lru_results, label="lru")
-        plt.plot(self.increments, self.clock_results, label="clock")
+        for policy in self.policies:
+            plt.plot(self.increments, self.results[policy], label=policy)
 
         plt.title(self.name)
         plt.xlabel("Frame Count")
@@ -107,70 +122,286 @@ def plot_results(name, data_fp, min_frames):
     plt.close()
 
 
-file_names = ["gcc"]
-traces = []
+def load_traces(file_names, page_size=DEFAULT_PAGE_SIZE, policies=DEFAULT_POLICIES):
+    traces = []
 
-for file_name in file_names:
-    curr_traces = []
+    for file_name in file_names:
+        trace_fp = "traces/" + file_name + ".trace.gz"
 
-    with gzip.open("traces/" + file_name + ".trace.gz", "rt") as file:
-        for trace_line in file:
-            curr_trace = trace_line.split()
+        # Prefer the memory-mapped binary form of the trace when it has been converted
+        if os.path.exists(binary_path(trace_fp)):
+            addresses, writes = load_trace(binary_path(trace_fp))
+            pages = addresses >> page_offset_for(page_size)
+            traces.append(Trace(file_name, pages, writes.astype(bool), policies))
+            continue
 
-            if len(curr_trace) == 0:
-                continue
+        pages, writes = load_pages(trace_fp, page_size)
+        traces.append(Trace(file_name, pages, writes, policies))
 
-            logical_address = int(curr_trace[0], 16)
-            curr_trace[0] = logical_address >> PAGE_OFFSET
+    return traces
 
-            curr_traces.append(curr_trace)
 
-    traces.append(Trace(file_name, np.array(curr_traces)))
+# Spacing of a grid of at most increments frame counts up to max_frames - a power of two, so
+# doubling increments halves it
+def grid_step(max_frames, increments):
+    return 1 << max(0, math.ceil(math.log2(max_frames / increments)))
 
-data = {}
 
-# Loop through each trace
-for trace in traces:
-    print(f"\ncollecting results for {trace.name}...")
+# Multiples of the grid step below max_frames, then max_frames itself. Every finer grid
+# contains the coarser ones, so a refined sweep reuses all of their cached points
+def fixed_grid(max_frames, increments):
+    step = grid_step(max_frames, increments)
 
-    # Determine the increment size for the current trace
-    max_table_size = math.ceil(trace.UniqueFrames() * FRAME_TABLE_MULTIPLE)
-    increment_size = math.ceil(max_table_size / MAX_INCREMENTS)
+    return list(range(step, max_frames, step)) + [max_frames]
 
-    print(
-        f"| unique frames: {trace.UniqueFrames()}, total frames: {trace.NumMemoryAccesses()}"
-    )
-    print(f"| maximum frame count: {max_table_size}")
-    print(f"| increment size: {increment_size}")
-    print("| ")
 
-    # Loop through each increment/frame_count for the current trace and collect the results (memory reads/writes)
-    for frame_count in range(
-        increment_size, max_table_size + increment_size, increment_size
+# Fault rate (%) of every policy at each frame count, as {(policy, frame_count): rate}, averaged
+# over seeds. Points already in the cache are reused and new ones are added as jobs finish
+def collect_points(trace, digest, frame_counts, seeds, cache, page_size, workers, instruments=None):
+    # Cached points, one {(policy, frame_count): rate} per seed, and the jobs still to run
+    results = [{} for _ in seeds]
+    pending = {}
+    cached = 0
+
+    for policy in trace.policies:
+        policy_seeds = seeds if policy in SEEDED_POLICIES else seeds[:1]
+
+        for index, seed in enumerate(policy_seeds):
+            missing = []
+
+            for frame_count in frame_counts:
+                fault_rate = cache.get(digest, policy, frame_count, page_size, seed)
+
+                if fault_rate is None:
+                    missing.append(frame_count)
+                else:
+                    results[index][(policy, frame_count)] = fault_rate
+                    cached += 1
+
+            # LRU comes from one stack-distance pass, so any missing point means a full pass
+            if policy == "lru" and missing:
+                for frame_count in missing:
+                    fault_rate = trace.lru_fault_rate(frame_count)
+                    results[index][(policy, frame_count)] = fault_rate
+                    cache.add(digest, policy, frame_count, page_size, seed, fault_rate)
+            elif missing:
+                pending.setdefault((index, seed, tuple(missing)), []).append(policy)
+
+    print(f"| frame counts: {len(frame_counts)}, cached points: {cached}")
+
+    if instruments is not None:
+        instruments.count("cached_points", cached)
+
+    # Each job fuses several frame counts and policies into one pass over the trace. Policies
+    # missing the same points are grouped so they still share passes
+    jobs = []
+
+    for (_, seed, missing), policies in pending.items():
+        jobs.extend(make_jobs(trace.name, policies, missing, [seed]))
+
+    for (_, _, job_frame_counts, seed), fault_rates in zip(
+        jobs, run_sweep({trace.name: (trace.pages, trace.writes)}, jobs, workers, instruments)
     ):
-        if frame_count % (increment_size) == 0:
-            print(f"\r| frame count : {frame_count}", end="")
+        print(f"\r| frame count : {job_frame_counts[-1]}", end="")
+        results.append(fault_rates)
+
+        if instruments is not None:
+            instruments.count("jobs")
+            instruments.count("simulated_points", len(fault_rates))
+
+        for (policy, frame_count), fault_rate in fault_rates.items():
+            cache.add(digest, policy, frame_count, page_size, seed, fault_rate)
+
+    if jobs:
+        print()
+
+    return average_results(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep frame counts over the bundled traces")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes to split the sweep across (default: 1, serial)",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        help=f"page size in bytes, a power of two (default: {DEFAULT_PAGE_SIZE})",
+    )
+    parser.add_argument(
+        "--policies",
+        nargs="+",
+        choices=list(POLICIES),
+        default=DEFAULT_POLICIES,
+        help=f"replacement policies to sweep (default: {' '.join(DEFAULT_POLICIES)})",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="seed for randomised policies, for reproducible results (default: unseeded)",
+    )
+    parser.add_argument(
+        "--seeds",
+        type=int,
+        default=1,
+        help="average randomised policies over this many seeds, run as separate jobs (default: 1)",
+    )
+    parser.add_argument(
+        "--increments",
+        type=int,
+        default=MAX_INCREMENTS,
+        help="maximum number of frame counts swept per trace, spaced by a power of two so "
+        f"finer sweeps reuse coarser ones (default: {MAX_INCREMENTS})",
+    )
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_FP,
+        help=f"results cache, so interrupted or refined sweeps resume (default: {DEFAULT_CACHE_FP})",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="recompute every point")
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="start from a coarse grid and bisect where the fault rates change fastest, "
+        "simulating at most --increments frame counts",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"with --adaptive, largest fault rate change (%%) left between points (default: {DEFAULT_TOLERANCE})",
+    )
+    parser.add_argument(
+        "--initial-points",
+        type=int,
+        default=DEFAULT_INITIAL_POINTS,
+        help=f"with --adaptive, frame counts in the coarse grid (default: {DEFAULT_INITIAL_POINTS})",
+    )
+    parser.add_argument(
+        "--stats",
+        help="write counters and histograms of the sweep as JSON to this file "
+        "(per-policy detail only with --workers 1)",
+    )
+    parser.add_argument(
+        "--profile", help="write cProfile stats of the sweep to this file (main process only)"
+    )
+    args = parser.parse_args()
+
+    try:
+        page_offset_for(args.page_size)
+    except ValueError as error:
+        parser.error(str(error))
+
+    if args.seeds < 1:
+        parser.error("--seeds must be at least 1")
+
+    if args.increments < 1:
+        parser.error("--increments must be at least 1")
+
+    if args.tolerance <= 0:
+        parser.error("--tolerance must be positive")
+
+    # Consecutive seeds from --seed, or a fresh unseeded generator for every run
+    seeds = [None if args.seed is None else args.seed + i for i in range(args.seeds)]
+
+    file_names = ["gcc"]
+    traces = load_traces(file_names, args.page_size, args.policies)
+
+    instruments = Instruments() if args.stats else None
+    data = {}
+
+    # The whole sweep is profiled when --profile is given. The cache is closed however the
+    # sweep ends, so an interrupted run never leaves a record half written
+    with profiled(args.profile), ResultCache(
+        os.devnull if args.no_cache else args.cache
+    ) as cache:
+        # Loop through each trace
+        for trace in traces:
+            print(f"\ncollecting results for {trace.name}...")
+
+            trace.analyze(args.page_size)
+            digest = trace.digest
+
+            # Size the sweep from the trace's LRU knee and working set, then lay out the frame counts
+            max_table_size = frame_limit(trace.profile)
+
+            print(
+                f"| unique frames: {trace.UniqueFrames()}, total frames: {trace.NumMemoryAccesses()}"
+            )
+            print(f"| write ratio: {trace.profile['write_ratio']:.4f}")
+            print(f"| phases: {len(trace.profile['phase_starts'])}")
+
+            for window, size in trace.profile["working_set"].items():
+                print(f"| mean working set over {window} accesses: {size:.1f} pages")
+
+            print(f"| maximum frame count: {max_table_size}")
+
+            if args.adaptive:
+                print(f"| tolerance: {args.tolerance}%")
+            else:
+                print(f"| increment size: {grid_step(max_table_size, args.increments)}")
+
+            print(f"| workers: {args.workers}")
+            print(f"| seeds: {seeds}")
+
+            trace_instruments = None if instruments is None else instruments.scope(trace.name)
+
+            def evaluate(frame_counts):
+                return collect_points(
+                    trace,
+                    digest,
+                    frame_counts,
+                    seeds,
+                    cache,
+                    args.page_size,
+                    args.workers,
+                    trace_instruments,
+                )
+
+            if args.adaptive:
+                frame_counts, fault_rates = adaptive_sweep(
+                    evaluate,
+                    trace.policies,
+                    max_table_size,
+                    args.initial_points,
+                    args.tolerance,
+                    args.increments,
+                )
+            else:
+                frame_counts = fixed_grid(max_table_size, args.increments)
+                fault_rates = evaluate(frame_counts)
+
+            print("| ")
+            print(f"| frame counts simulated: {len(frame_counts)}")
+
+            for frame_count in frame_counts:
+                trace.record_results(frame_count, fault_rates)
+
+            data[trace.name] = {"increments": trace.increments, **trace.results}
+
+            data_fp = "data/" + trace.name + "_data.json"
 
-        trace.collect_results(frame_count)
+            with open(data_fp, "w") as f:
+                json.dump(data, f, indent=4)
 
-    data[trace.name] = {
-        "increments": trace.increments,
-        "rand": trace.rand_results,
-        "lru": trace.lru_results,
-        "clock": trace.clock_results,
-    }
+            print("| ")
+            print("| saving plot...")
 
-    data_fp = "data/" + trace.name + "_data.json"
+            # plot_results(trace.name, data_fp)
 
-    with open(data_fp, "w") as f:
-        json.dump(data, f, indent=4)
+            print("-> done!")
 
-    print("\n| ")
-    print("| saving plot...")
+    if instruments is not None:
+        instruments.write_json(args.stats)
 
-    # plot_results(trace.name, data_fp)
 
-    print("-> done!")
+if __name__ == "__main__":
+    main()
 
 """
 for x in range(1, 2):
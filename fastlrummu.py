@@ -0,0 +1,115 @@
+from collections import OrderedDict
+
+from mmu import MMU, free_frame_stack, to_list
+
+
+class FastLruMMU(MMU):
+    def __init__(self, frames):
+        self.frames = frames
+        self.page_table = [None] * frames
+        self.dirty_bits = [0] * frames
+
+        # Resident pages mapped to their frame, ordered from least to most recently used
+        self.recency = OrderedDict()
+
+        self.free_frames = free_frame_stack(frames)
+
+        self.logical_time = 0
+
+        self.total_disk_reads = 0
+        self.total_disk_writes = 0
+        self.total_page_faults = 0
+
+        self.debug_mode = False
+
+    def set_debug(self):
+        self.debug_mode = True
+
+    def reset_debug(self):
+        self.debug_mode = False
+
+    # Returns a frame that can be replaced - either a free frame, or the one holding the least
+    # recently used (LRU) page, which is always at the front of the recency ordering
+    def __get_replaceable_frame(self):
+        if self.free_frames:
+            return self.free_frames.pop()
+
+        _, lru_frame = self.recency.popitem(last=False)
+
+        return lru_frame
+
+    # Simulates writing a page to disk (if it's dirty), and reading a new page from disk, from
+    # page table entry frame_number
+    def __replace_frame(self, frame_number):
+        self._write_back(frame_number)
+        self.total_disk_reads += 1
+        self.total_page_faults += 1
+
+    # Simulates reading from page page_number, and writing to page_number if write is true
+    def __get_page(self, page_number, write):
+        self.logical_time += 1
+
+        frame_num = self.recency.get(page_number)
+
+        # On a hit, promote the page to most recently used
+        if frame_num is not None:
+            self.recency.move_to_end(page_number)
+
+            if write:
+                self.dirty_bits[frame_num] = 1
+
+            return
+
+        self.__load_page(page_number, write)
+
+    def __load_page(self, page_number, write):
+        lru_frame = self.__get_replaceable_frame()
+
+        if self.debug_mode:
+            self._log_debug_message(
+                f"Replacing page {self.page_table[lru_frame]} (frame {lru_frame}) with page {page_number}..."
+            )
+
+        self.__replace_frame(lru_frame)
+
+        self.page_table[lru_frame] = page_number
+        self.recency[page_number] = lru_frame
+
+        if write:
+            self.dirty_bits[lru_frame] = 1
+
+    def process_batch(self, pages, writes):
+        recency = self.recency
+        dirty_bits = self.dirty_bits
+        logical_time = self.logical_time
+
+        for page_number, write in zip(to_list(pages), to_list(writes)):
+            logical_time += 1
+            frame_num = recency.get(page_number)
+
+            if frame_num is None:
+                self.logical_time = logical_time
+                self.__load_page(page_number, write)
+                continue
+
+            recency.move_to_end(page_number)
+
+            if write:
+                dirty_bits[frame_num] = 1
+
+        self.logical_time = logical_time
+
+    def read_memory(self, page_number):
+        self.__get_page(page_number=page_number, write=False)
+
+    def write_memory(self, page_number):
+        self.__get_page(page_number=page_number, write=True)
+
+    def get_total_disk_reads(self):
+        return self.total_disk_reads
+
+    def get_total_disk_writes(self):
+        return self.total_disk_writes
+
+    def get_total_page_faults(self):
+        return self.total_page_faults
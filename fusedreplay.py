@@ -0,0 +1,95 @@
+'''
+* Fused multi-policy replay.
+* Rather than replaying the trace once per (policy, frame count) pair, the
+* trace is decoded once and walked once, block by block. Each block is fed to
+* every MMU before moving on, so the shared page stream stays in cache while
+* all the policies consume it. Policies that have a compiled kernel (see
+* kernels.py) run over dense page ids that are computed once for the whole
+* set.
+*
+'''
+import numpy as np
+
+from kernels import ACCELERATED, KERNELS, dense_ids
+from optmmu import next_uses
+from policies import OFFLINE_POLICIES, create_mmu
+
+BLOCK_SIZE = 1 << 16  # accesses handed to every MMU before moving to the next block
+
+
+class FusedReplay:
+    # seed is passed to every randomised policy, see policies.SEEDED_POLICIES
+    # With instruments, each policy's MMUs report into instruments.scope(policy)
+    def __init__(self, policies, frame_counts, seed=None, block_size=BLOCK_SIZE, instruments=None):
+        self.policies = list(policies)
+        self.frame_counts = list(frame_counts)
+        self.seed = seed
+        self.block_size = block_size
+        self.instruments = instruments
+
+        # (policy, frame count) -> (disk reads, disk writes, page faults)
+        self.results = {}
+        self.events = 0
+
+    def run(self, pages, writes):
+        pages = np.asarray(pages)
+        writes = np.asarray(writes, dtype=np.bool_)
+        self.events = len(pages)
+
+        mmus = {}
+        kernel_jobs = []
+        # Next-use positions, worked out once for every offline policy's MMUs
+        next_use = None
+
+        for policy in self.policies:
+            for frames in self.frame_counts:
+                if ACCELERATED and policy in KERNELS:
+                    kernel_jobs.append((policy, frames))
+                else:
+                    mmus[(policy, frames)] = create_mmu(policy, frames, self.seed)
+
+                    if policy in OFFLINE_POLICIES:
+                        if next_use is None:
+                            next_use = next_uses(pages).tolist()
+
+                        mmus[(policy, frames)].set_trace(pages, next_use)
+
+                    if self.instruments is not None:
+                        mmus[(policy, frames)].set_instruments(self.instruments.scope(policy))
+
+        if kernel_jobs:
+            ids, unique_pages = dense_ids(pages)
+
+            for policy, frames in kernel_jobs:
+                disk_reads, disk_writes, page_faults = KERNELS[policy](
+                    ids, writes, frames, unique_pages, self.seed
+                )
+                self.results[(policy, frames)] = (
+                    int(disk_reads),
+                    int(disk_writes),
+                    int(page_faults),
+                )
+
+        # Decode each block to Python lists once, then let every MMU consume it
+        for start in range(0, len(pages), self.block_size):
+            block_pages = pages[start : start + self.block_size].tolist()
+            block_writes = writes[start : start + self.block_size].tolist()
+
+            for mmu in mmus.values():
+                if mmu.instruments is None:
+                    mmu.process_batch(block_pages, block_writes)
+                else:
+                    mmu.instruments.run_batch(mmu, block_pages, block_writes)
+
+        for key, mmu in mmus.items():
+            self.results[key] = (
+                mmu.get_total_disk_reads(),
+                mmu.get_total_disk_writes(),
+                mmu.get_total_page_faults(),
+            )
+
+        return self.results
+
+    # Page fault rate (%) of one policy at one frame count
+    def fault_rate(self, policy, frames):
+        return self.results[(policy, frames)][2] / self.events * 100
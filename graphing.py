@@ -1,3 +1,4 @@
+import bisect
 import json
 import matplotlib.pyplot as plt
 
@@ -16,31 +17,19 @@ def plot_results(name, data_fp, min_frames):
 
     increments = data[name]["increments"]
 
-    # curr_start_frame = 0
-    curr_start_index = 50
+    # Skip the frame counts below min_frames, where every policy faults too often to compare.
+    # Sweeps differ in how many points they have, so this goes by frame count, not position
+    curr_start_index = bisect.bisect_left(increments, min_frames)
 
-    if name == "sixpack":
-        curr_start_index = 100
-    elif name == "gcc":
-        curr_start_index = 100
-    elif name == "swim":
-        curr_start_index = 80
+    if curr_start_index == len(increments):
+        curr_start_index = 0
 
-    # for count in increments:
-    #     if curr_start_frame >= min_frames:
-    #         break
+    increments = increments[curr_start_index::]
 
-    #     curr_start_index += 1
-    #     curr_start_frame = count
-
-    increments = data[name]["increments"][curr_start_index::]
-    rand_results = data[name]["rand"][curr_start_index::]
-    lru_results = data[name]["lru"][curr_start_index::]
-    clock_results = data[name]["clock"][curr_start_index::]
-
-    plt.plot(increments, rand_results, label="rand")
-    plt.plot(increments, lru_results, label="lru")
-    plt.plot(increments, clock_results, label="clock")
+    # Every other key holds the results of one replacement policy
+    for policy, results in data[name].items():
+        if policy != "increments":
+            plt.plot(increments, results[curr_start_index::], label=policy)
 
     plt.title(name)
     plt.xlabel("Frame Count")
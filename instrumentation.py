@@ -0,0 +1,96 @@
+'''
+* Optional instrumentation of the simulator's hot paths.
+* An Instruments object collects named counters and histograms, and can be
+* split into named scopes (one per policy, say) that are exported as nested
+* JSON. Nothing is measured unless an Instruments object is attached:
+*   - run_batch() wraps one MMU.process_batch call, timing it and counting
+*     hits, misses and dirty write-backs from the MMU's own totals, so the
+*     per-access loop is left untouched.
+*   - MMUs attached with MMU.set_instruments() record policy specific detail,
+*     such as ClockMMU's eviction scan lengths, on their miss path only.
+*
+* profiled() wraps any block in cProfile and writes the stats to a file that
+* can be read with pstats or snakeviz.
+*
+'''
+import contextlib
+import cProfile
+import json
+import time
+
+
+class Instruments:
+    def __init__(self):
+        self.counters = {}
+        # histogram name -> {value: occurrences}
+        self.histograms = {}
+        self.scopes = {}
+
+    # Child instruments exported under this one as scopes[name], created on first use
+    def scope(self, name):
+        if name not in self.scopes:
+            self.scopes[name] = Instruments()
+
+        return self.scopes[name]
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        histogram = self.histograms.setdefault(name, {})
+        histogram[value] = histogram.get(value, 0) + 1
+
+    # Runs mmu.process_batch(pages, writes), recording its time and what it did
+    def run_batch(self, mmu, pages, writes):
+        page_faults = mmu.get_total_page_faults()
+        disk_writes = mmu.get_total_disk_writes()
+
+        start = time.perf_counter()
+        mmu.process_batch(pages, writes)
+        seconds = time.perf_counter() - start
+
+        misses = mmu.get_total_page_faults() - page_faults
+
+        self.count("batches")
+        self.count("accesses", len(pages))
+        self.count("hits", len(pages) - misses)
+        self.count("misses", misses)
+        self.count("dirty_write_backs", mmu.get_total_disk_writes() - disk_writes)
+        self.count("batch_seconds", seconds)
+        # Batch times are bucketed by the power of two of microseconds at or above them
+        self.observe("batch_microseconds", 1 << int(seconds * 1e6).bit_length())
+
+    def to_dict(self):
+        data = {
+            "counters": dict(self.counters),
+            "histograms": {
+                name: {str(value): histogram[value] for value in sorted(histogram)}
+                for name, histogram in self.histograms.items()
+            },
+        }
+
+        if self.scopes:
+            data["scopes"] = {name: scope.to_dict() for name, scope in self.scopes.items()}
+
+        return data
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+
+# Profiles the enclosed block with cProfile, writing the stats to path. A None path profiles nothing
+@contextlib.contextmanager
+def profiled(path):
+    if path is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
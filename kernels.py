@@ -0,0 +1,289 @@
+'''
+* Optional compiled replacement-policy kernels.
+* Each kernel replays a whole trace of dense integer page ids through one
+* policy using only flat NumPy arrays, so Numba can compile it to machine
+* code. When Numba isn't installed, simulate() falls back to the pure-Python
+* MMU classes and the kernels remain plain (slow) Python functions, which is
+* still enough for verify_equivalence() to check them.
+*
+* The kernels reproduce LruMMU, ClockMMU and RandMMU exactly. The random
+* kernel is fed victims drawn in blocks from the same NumPy generator, and
+* with the same block size, as RandMMU, so a seeded run evicts the same frames.
+*
+* Usage: python kernels.py [tracefile]   (runs the equivalence check)
+*
+'''
+import sys
+
+import numpy as np
+
+from policies import OFFLINE_POLICIES, create_mmu
+from randmmu import RANDOM_BLOCK
+from tracestream import load_pages
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+ACCELERATED = njit is not None
+
+
+def _compile(kernel):
+    if ACCELERATED:
+        return njit(cache=True, nogil=True)(kernel)
+
+    return kernel
+
+
+# LRU over a doubly linked list of frames, most recently used at the head
+def _lru_kernel(ids, writes, frames, unique_pages):
+    frame_of = np.full(unique_pages, -1, dtype=np.int64)
+    page_of = np.full(frames, -1, dtype=np.int64)
+    dirty = np.zeros(frames, dtype=np.uint8)
+    prev_frame = np.full(frames, -1, dtype=np.int64)
+    next_frame = np.full(frames, -1, dtype=np.int64)
+    head = -1
+    tail = -1
+    used = 0
+    disk_reads = 0
+    disk_writes = 0
+
+    for i in range(len(ids)):
+        page = ids[i]
+        frame = frame_of[page]
+
+        if frame < 0:
+            disk_reads += 1
+
+            if used < frames:
+                frame = used
+                used += 1
+            else:
+                # Evict the tail (least recently used) frame
+                frame = tail
+                tail = prev_frame[frame]
+
+                if tail >= 0:
+                    next_frame[tail] = -1
+                else:
+                    head = -1
+
+                if dirty[frame] == 1:
+                    disk_writes += 1
+
+                frame_of[page_of[frame]] = -1
+
+            page_of[frame] = page
+            frame_of[page] = frame
+            dirty[frame] = 0
+        elif frame != head:
+            # Unlink the frame so it can move to the head
+            before = prev_frame[frame]
+            after = next_frame[frame]
+            next_frame[before] = after
+
+            if after >= 0:
+                prev_frame[after] = before
+            else:
+                tail = before
+        else:
+            if writes[i]:
+                dirty[frame] = 1
+
+            continue
+
+        prev_frame[frame] = -1
+        next_frame[frame] = head
+
+        if head >= 0:
+            prev_frame[head] = frame
+
+        head = frame
+
+        if tail < 0:
+            tail = frame
+
+        if writes[i]:
+            dirty[frame] = 1
+
+    return disk_reads, disk_writes, disk_reads
+
+
+def _clock_kernel(ids, writes, frames, unique_pages):
+    frame_of = np.full(unique_pages, -1, dtype=np.int64)
+    page_of = np.full(frames, -1, dtype=np.int64)
+    dirty = np.zeros(frames, dtype=np.uint8)
+    use = np.zeros(frames, dtype=np.uint8)
+    pointer = 0
+    disk_reads = 0
+    disk_writes = 0
+
+    for i in range(len(ids)):
+        page = ids[i]
+        frame = frame_of[page]
+
+        if frame >= 0:
+            use[frame] = 1
+
+            if writes[i]:
+                dirty[frame] = 1
+
+            continue
+
+        disk_reads += 1
+
+        while use[pointer] == 1:
+            use[pointer] = 0
+            pointer = (pointer + 1) % frames
+
+        if dirty[pointer] == 1:
+            disk_writes += 1
+
+        if page_of[pointer] >= 0:
+            frame_of[page_of[pointer]] = -1
+
+        page_of[pointer] = page
+        frame_of[page] = pointer
+        use[pointer] = 1
+        dirty[pointer] = 1 if writes[i] else 0
+        pointer = (pointer + 1) % frames
+
+    return disk_reads, disk_writes, disk_reads
+
+
+# Replays from position start until the trace ends or the victims run out. State is kept in
+# the arrays passed in so the caller can resume with a fresh block of victims. counters
+# holds [page faults, disk writes, next free frame]. Returns the position reached
+def _rand_kernel(ids, writes, start, victims, frame_of, page_of, dirty, counters):
+    frames = len(page_of)
+    used = 0
+
+    for i in range(start, len(ids)):
+        page = ids[i]
+        frame = frame_of[page]
+
+        if frame >= 0:
+            if writes[i]:
+                dirty[frame] = 1
+
+            continue
+
+        if counters[2] < frames:
+            frame = counters[2]
+            counters[2] += 1
+        elif used == len(victims):
+            return i
+        else:
+            frame = victims[used]
+            used += 1
+
+        counters[0] += 1
+
+        if dirty[frame] == 1:
+            counters[1] += 1
+            dirty[frame] = 0
+
+        if page_of[frame] >= 0:
+            frame_of[page_of[frame]] = -1
+
+        page_of[frame] = page
+        frame_of[page] = frame
+
+        if writes[i]:
+            dirty[frame] = 1
+
+    return len(ids)
+
+
+lru_kernel = _compile(_lru_kernel)
+clock_kernel = _compile(_clock_kernel)
+rand_kernel = _compile(_rand_kernel)
+
+
+def _run_lru_kernel(ids, writes, frames, unique_pages, seed=None):
+    return lru_kernel(ids, writes, frames, unique_pages)
+
+
+def _run_clock_kernel(ids, writes, frames, unique_pages, seed=None):
+    return clock_kernel(ids, writes, frames, unique_pages)
+
+
+def _run_rand_kernel(ids, writes, frames, unique_pages, seed=None):
+    frame_of = np.full(unique_pages, -1, dtype=np.int64)
+    page_of = np.full(frames, -1, dtype=np.int64)
+    dirty = np.zeros(frames, dtype=np.uint8)
+    counters = np.zeros(3, dtype=np.int64)
+
+    # Same generator and block size as RandMMU, so a seeded run evicts the same frames
+    rng = np.random.default_rng(seed)
+    position = rand_kernel(ids, writes, 0, np.zeros(0, dtype=np.int64), frame_of, page_of, dirty, counters)
+
+    while position < len(ids):
+        victims = rng.integers(0, frames, RANDOM_BLOCK)
+        position = rand_kernel(ids, writes, position, victims, frame_of, page_of, dirty, counters)
+
+    return int(counters[0]), int(counters[1]), int(counters[0])
+
+
+KERNELS = {"lru": _run_lru_kernel, "clock": _run_clock_kernel, "rand": _run_rand_kernel}
+
+
+# Maps page numbers onto 0..unique_pages-1 so kernels can index flat arrays by page
+def dense_ids(pages):
+    unique, ids = np.unique(np.asarray(pages), return_inverse=True)
+
+    return ids.astype(np.int64), len(unique)
+
+
+def run_kernel(policy, pages, writes, frames, seed=None):
+    ids, unique_pages = dense_ids(pages)
+    writes = np.asarray(writes, dtype=np.bool_)
+
+    disk_reads, disk_writes, page_faults = KERNELS[policy](ids, writes, frames, unique_pages, seed)
+
+    return int(disk_reads), int(disk_writes), int(page_faults)
+
+
+def run_mmu(policy, pages, writes, frames, seed=None):
+    mmu = create_mmu(policy, frames, seed)
+
+    if policy in OFFLINE_POLICIES:
+        mmu.set_trace(pages)
+
+    mmu.process_batch(pages, writes)
+
+    return mmu.get_total_disk_reads(), mmu.get_total_disk_writes(), mmu.get_total_page_faults()
+
+
+# Returns (disk reads, disk writes, page faults) for the policy, compiled when possible
+def simulate(policy, pages, writes, frames, seed=None):
+    if ACCELERATED and policy in KERNELS:
+        return run_kernel(policy, pages, writes, frames, seed)
+
+    return run_mmu(policy, pages, writes, frames, seed)
+
+
+# Checks every kernel against its MMU class, raising AssertionError on the first mismatch
+def verify_equivalence(pages, writes, frame_counts=(1, 2, 7, 50, 200), seed=0):
+    for policy in KERNELS:
+        for frames in frame_counts:
+            expected = run_mmu(policy, pages, writes, frames, seed)
+            actual = run_kernel(policy, pages, writes, frames, seed)
+
+            assert actual == expected, (
+                f"{policy} kernel with {frames} frames gave {actual}, expected {expected}"
+            )
+
+
+def main():
+    trace_fp = sys.argv[1] if len(sys.argv) > 1 else "sample.trace"
+    pages, writes = load_pages(trace_fp)
+
+    print(f"accelerated: {ACCELERATED}")
+    verify_equivalence(pages, writes)
+    print(f"kernels match LruMMU, ClockMMU and RandMMU on {trace_fp}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+from collections import OrderedDict
+
+from mmu import MMU, free_frame_stack, to_list
+
+HIR_FRACTION = 0.01  # share of the frames holding resident HIR pages, as suggested by Jiang & Zhang
+GHOST_MULTIPLE = 2  # non-resident HIR pages kept in the stack, as a multiple of the frame count
+
+
+# Low Inter-reference Recency Set (Jiang & Zhang). Pages are ranked by the recency of their
+# last two references. Most frames hold LIR pages, whose reuse distance is short, and a few
+# hold HIR pages in a FIFO queue that supplies every victim. The recency stack S also keeps
+# recently evicted HIR pages, so one that comes back while still in S proves a short reuse
+# distance and becomes LIR, demoting the LIR page at the bottom of S
+class LirsMMU(MMU):
+    def __init__(self, frames):
+        self.frames = frames
+        self.page_table = [None] * frames
+        self.dirty_bits = [0] * frames
+
+        # With a single frame there's no room for an HIR page, and the LIR page is the victim
+        self.lir_limit = max(1, frames - max(1, int(frames * HIR_FRACTION)))
+        self.ghost_limit = max(1, frames * GHOST_MULTIPLE)
+
+        # Resident page -> frame
+        self.page_frames = {}
+        self.lir_pages = set()
+        # Recency stack S, bottom (least recent) first
+        self.stack = OrderedDict()
+        # Resident HIR pages, oldest first - the front is always the next victim
+        self.hir_queue = OrderedDict()
+        # Non-resident HIR pages still in S, oldest first, so their number can be bounded
+        self.ghosts = OrderedDict()
+
+        self.free_frames = free_frame_stack(frames)
+
+        self.logical_time = 0
+
+        self.total_disk_reads = 0
+        self.total_disk_writes = 0
+        self.total_page_faults = 0
+
+        self.debug_mode = False
+
+    def set_debug(self):
+        self.debug_mode = True
+
+    def reset_debug(self):
+        self.debug_mode = False
+
+    # Removes HIR pages from the bottom of S until an LIR page is there
+    def __prune_stack(self):
+        stack = self.stack
+
+        while stack:
+            page_number = next(iter(stack))
+
+            if page_number in self.lir_pages:
+                return
+
+            del stack[page_number]
+            self.ghosts.pop(page_number, None)
+
+    # The LIR page at the bottom of S becomes a resident HIR page
+    def __demote_bottom_lir(self):
+        page_number, _ = self.stack.popitem(last=False)
+        self.lir_pages.discard(page_number)
+        self.hir_queue[page_number] = None
+        self.__prune_stack()
+
+    # Moves the page to the top of S as an LIR page, keeping the LIR set within its share
+    def __make_lir(self, page_number):
+        self.hir_queue.pop(page_number, None)
+        self.ghosts.pop(page_number, None)
+        self.lir_pages.add(page_number)
+        self.stack[page_number] = None
+        self.stack.move_to_end(page_number)
+
+        if len(self.lir_pages) > self.lir_limit:
+            self.__demote_bottom_lir()
+
+    # Returns a free frame, or evicts the oldest resident HIR page, which stays in S as a ghost
+    def __get_replaceable_frame(self):
+        if self.free_frames:
+            return self.free_frames.pop()
+
+        if not self.hir_queue:
+            self.__demote_bottom_lir()
+
+        page_number, _ = self.hir_queue.popitem(last=False)
+        frame_num = self.page_frames.pop(page_number)
+
+        if page_number in self.stack:
+            self.ghosts[page_number] = None
+
+            if len(self.ghosts) > self.ghost_limit:
+                ghost, _ = self.ghosts.popitem(last=False)
+                del self.stack[ghost]
+
+        self._write_back(frame_num)
+
+        return frame_num
+
+    # Updates S, the LIR set and the HIR queue for a page that was already resident
+    def __touch(self, page_number):
+        if page_number in self.lir_pages:
+            at_bottom = next(iter(self.stack)) == page_number
+            self.stack.move_to_end(page_number)
+
+            if at_bottom:
+                self.__prune_stack()
+        elif page_number in self.stack:
+            # A resident HIR page re-referenced while still in S has a short reuse distance
+            self.__make_lir(page_number)
+        else:
+            self.stack[page_number] = None
+            self.hir_queue.move_to_end(page_number)
+
+    # Simulates reading from page page_number, and writing to page_number if write is true
+    def __get_page(self, page_number, write):
+        self.logical_time += 1
+
+        frame_num = self.page_frames.get(page_number)
+
+        if frame_num is not None:
+            self.__touch(page_number)
+
+            if write:
+                self.dirty_bits[frame_num] = 1
+
+            return
+
+        self.__load_page(page_number, write)
+
+    def __load_page(self, page_number, write):
+        frame_num = self.__get_replaceable_frame()
+
+        if self.debug_mode:
+            self._log_debug_message(
+                f"Replacing page {self.page_table[frame_num]} (frame {frame_num}) with page {page_number}..."
+            )
+
+        self.total_disk_reads += 1
+        self.total_page_faults += 1
+
+        self.page_table[frame_num] = page_number
+        self.page_frames[page_number] = frame_num
+
+        if len(self.lir_pages) < self.lir_limit or page_number in self.stack:
+            # Frames are still being filled, or the page returned while its ghost was in S
+            self.__make_lir(page_number)
+        else:
+            self.stack[page_number] = None
+            self.hir_queue[page_number] = None
+
+        if write:
+            self.dirty_bits[frame_num] = 1
+
+    def process_batch(self, pages, writes):
+        page_frames = self.page_frames
+        lir_pages = self.lir_pages
+        stack = self.stack
+        dirty_bits = self.dirty_bits
+        logical_time = self.logical_time
+
+        for page_number, write in zip(to_list(pages), to_list(writes)):
+            logical_time += 1
+            frame_num = page_frames.get(page_number)
+
+            if frame_num is None:
+                self.logical_time = logical_time
+                self.__load_page(page_number, write)
+                continue
+
+            # LIR pages away from the bottom of S only need to move to the top
+            if page_number in lir_pages and next(iter(stack)) != page_number:
+                stack.move_to_end(page_number)
+            else:
+                self.__touch(page_number)
+
+            if write:
+                dirty_bits[frame_num] = 1
+
+        self.logical_time = logical_time
+
+    def read_memory(self, page_number):
+        self.__get_page(page_number=page_number, write=False)
+
+    def write_memory(self, page_number):
+        self.__get_page(page_number=page_number, write=True)
+
+    def get_total_disk_reads(self):
+        return self.total_disk_reads
+
+    def get_total_disk_writes(self):
+        return self.total_disk_writes
+
+    def get_total_page_faults(self):
+        return self.total_page_faults
@@ -1,4 +1,6 @@
-from mmu import MMU
+import heapq
+
+from mmu import MMU, to_list
 
 
 class LruMMU(MMU):
@@ -7,6 +9,9 @@ class LruMMU(MMU):
         self.page_table = [None] * frames
         self.dirty_bits = [0] * frames
 
+        # Maps each resident page to the frame holding it, so residency checks don't scan the page table
+        self.page_frames = {}
+
         # Takes inspiration from Lamport time - incremented after each "event" (read/write) to determine logical ordering
         self.logical_time = 0
         self.page_timestamps = [None] * frames
@@ -46,14 +51,7 @@ class LruMMU(MMU):
     # page table entry frame_number
     def __replace_frame(self, frame_number):
         # If the replaced page has any changes, write it to disk
-        if self.dirty_bits[frame_number] == 1:
-            self.total_disk_writes += 1
-            self.dirty_bits[frame_number] = 0
-
-            if self.debug_mode:
-                self.__log_debug_message(
-                    f"Page {self.page_table[frame_number]} (frame {frame_number}) dirty - wrote to disk"
-                )
+        self._write_back(frame_number)
 
         # Read in new page from disk
         self.total_disk_reads += 1
@@ -61,41 +59,101 @@ class LruMMU(MMU):
         # We've added a page to the page table, hence page faulted
         self.total_page_faults += 1
 
-    def __log_debug_message(self, msg):
-        print(f"{self.logical_time}: {msg}")
-
     # Simulates reading from page page_number, and writing to page_number if write is trur
     def __get_page(self, page_number, write):
         self.logical_time += 1
 
         # Check if the page number is already in the page table
-        for frame_num, page_num in enumerate(self.page_table):
-            if page_num == page_number:
-                self.page_timestamps[frame_num] = self.logical_time
+        frame_num = self.page_frames.get(page_number)
+
+        if frame_num is not None:
+            self.page_timestamps[frame_num] = self.logical_time
 
-                if write:
-                    self.dirty_bits[frame_num] = 1
+            if write:
+                self.dirty_bits[frame_num] = 1
 
-                return
+            return
 
         # Otherwise, we have to fetch the page from disk and replace an occupied frame
+        self.__load_page(page_number, write)
+
+    def __load_page(self, page_number, write):
         lru_frame = self.__get_replaceable_frame()  # Get the least recently used page
 
         if self.debug_mode:
-            self.__log_debug_message(
+            self._log_debug_message(
                 f"Replacing page {self.page_table[lru_frame]} (frame {lru_frame}) with page {page_number}..."
             )
 
+        if self.instruments is not None and self.page_table[lru_frame] is not None:
+            # accesses since the evicted page was last used
+            self.instruments.observe("eviction_age", self.logical_time - self.page_timestamps[lru_frame])
+
         # Perform necessary reads/writes to disk to replace the frame
         self.__replace_frame(lru_frame)
 
         # Update new page in page table
+        if self.page_table[lru_frame] is not None:
+            del self.page_frames[self.page_table[lru_frame]]
+
         self.page_table[lru_frame] = page_number
+        self.page_frames[page_number] = lru_frame
         self.page_timestamps[lru_frame] = self.logical_time
 
         if write:
             self.dirty_bits[lru_frame] = 1
 
+        if self.disk is not None:
+            self.disk.read(page_number, self.logical_time)
+
+    def process_batch(self, pages, writes):
+        page_frames = self.page_frames
+        page_timestamps = self.page_timestamps
+        dirty_bits = self.dirty_bits
+        logical_time = self.logical_time
+
+        for page_number, write in zip(to_list(pages), to_list(writes)):
+            logical_time += 1
+            frame_num = page_frames.get(page_number)
+
+            if frame_num is None:
+                self.logical_time = logical_time
+                self.__load_page(page_number, write)
+                continue
+
+            page_timestamps[frame_num] = logical_time
+
+            if write:
+                dirty_bits[frame_num] = 1
+
+        self.logical_time = logical_time
+
+    def is_resident(self, page_number):
+        return page_number in self.page_frames
+
+    # Marks up to count dirty pages clean from among the window least recently used, for a page
+    # cleaner that writes them back ahead of time. Returns how many it cleaned
+    def clean_pages(self, count, window):
+        if count <= 0:
+            return 0
+
+        resident = [
+            (timestamp, frame_num)
+            for frame_num, timestamp in enumerate(self.page_timestamps)
+            if timestamp is not None
+        ]
+        cleaned = 0
+
+        for _, frame_num in heapq.nsmallest(window, resident):
+            if cleaned >= count:
+                break
+
+            if self.dirty_bits[frame_num] == 1:
+                self.dirty_bits[frame_num] = 0
+                cleaned += 1
+
+        return cleaned
+
     def read_memory(self, page_number):
         self.__get_page(page_number=page_number, write=False)
 
@@ -0,0 +1,512 @@
+'''
+* Streaming server mode.
+* Replays a trace as it arrives - from a tracer writing to a Unix socket or a
+* pipe - instead of from a file, printing rolling statistics as it runs.
+*
+* Records come in frames, laid out like the binary trace format:
+*
+*   header    4 bytes: uint32 record count, little endian, at most MAX_FRAME
+*   addresses uint32[count], little endian logical addresses
+*   writes    uint8[count], 1 for a write and 0 for a read
+*
+* A reader thread decodes frames into a queue of at most queue_size frames,
+* and the simulator drains it, replaying as many queued frames as it can in
+* one process_batch call. When the simulator falls behind the queue fills,
+* the reader stops reading, and the producer blocks on a full socket or pipe
+* - so memory stays bounded however slow the policy is.
+*
+* Every interval seconds the fault rate, disk I/O and throughput over the
+* last window seconds are printed, and appended as JSON lines to a stats file
+* if one is given.
+*
+* A socket server keeps one MMU across connections, taking them one at a
+* time, until interrupted. The producer side streams any trace file in the
+* framing, so the server can be tried locally:
+*
+* Usage: python memserver.py serve (--socket PATH | --pipe PATH | -) --frames N
+*                                  [--policy lru] [--seed N] [--page-size BYTES]
+*                                  [--interval SECONDS] [--window SECONDS]
+*                                  [--queue-size FRAMES] [--stats-file PATH] [--once]
+*        python memserver.py produce tracefile (--socket PATH | --pipe PATH | -)
+*                                  [--frame-size RECORDS]
+*
+* e.g.   python memserver.py produce traces/gcc.trace.gz - |
+*            python memserver.py serve - --frames 100
+*
+'''
+import argparse
+import json
+import os
+import queue
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from binarytrace import MAGIC, MAX_ADDRESS, load_trace
+from policies import OFFLINE_POLICIES, POLICIES, create_mmu
+from tracestream import (
+    ADDRESS_PAGE_SIZE,
+    DEFAULT_PAGE_SIZE,
+    STDIN_NAME,
+    TraceFormatError,
+    open_trace,
+    page_offset_for,
+    peek_magic,
+    read_batches,
+)
+
+FRAME_HEADER = struct.Struct("<I")
+MAX_FRAME = 1 << 16  # records per frame
+DEFAULT_FRAME_SIZE = 4096  # records per frame sent by the producer
+DEFAULT_QUEUE_SIZE = 64  # frames buffered between the reader and the simulator
+BATCH_RECORDS = 1 << 16  # records replayed per process_batch call, at most
+DEFAULT_INTERVAL = 1.0  # seconds between statistics reports
+DEFAULT_WINDOW = 10.0  # seconds of history each report covers
+
+
+class FrameError(ValueError):
+    pass
+
+
+# Reads exactly size bytes, returning None if the stream ends cleanly first
+def _read_exact(stream, size):
+    data = stream.read(size)
+
+    if not data:
+        return None
+
+    while len(data) < size:
+        more = stream.read(size - len(data))
+
+        if not more:
+            raise FrameError(f"Stream ended {size - len(data)} bytes short of the end of a frame")
+
+        data += more
+
+    return data
+
+
+# Yields (addresses, writes) for each frame of the stream until it ends
+def read_frames(stream):
+    while True:
+        header = _read_exact(stream, FRAME_HEADER.size)
+
+        if header is None:
+            return
+
+        (count,) = FRAME_HEADER.unpack(header)
+
+        if count > MAX_FRAME:
+            raise FrameError(f"Frame of {count} records is over the limit of {MAX_FRAME}")
+
+        if count == 0:
+            continue
+
+        body = _read_exact(stream, 5 * count)
+
+        if body is None:
+            raise FrameError("Stream ended after a frame header")
+
+        addresses = np.frombuffer(body, dtype="<u4", count=count)
+        writes = np.frombuffer(body, dtype=np.uint8, offset=4 * count).astype(bool)
+
+        yield addresses, writes
+
+
+def write_frame(stream, addresses, writes):
+    if len(addresses) and np.max(addresses) > MAX_ADDRESS:
+        raise ValueError("Frames carry 32-bit addresses, and the trace has wider ones")
+
+    stream.write(FRAME_HEADER.pack(len(addresses)))
+    stream.write(np.asarray(addresses, dtype="<u4").tobytes())
+    stream.write(np.asarray(writes, dtype=np.uint8).tobytes())
+
+
+# Yields (addresses, writes) batches of a trace file, text or binary
+def _trace_batches(path):
+    stream = open_trace(path)
+
+    with stream:
+        if peek_magic(stream, len(MAGIC)) == MAGIC and path != STDIN_NAME:
+            addresses, writes = load_trace(path)
+
+            for start in range(0, len(addresses), MAX_FRAME):
+                end = start + MAX_FRAME
+                yield addresses[start:end], writes[start:end]
+
+            return
+
+        yield from read_batches(stream, page_offset_for(ADDRESS_PAGE_SIZE))
+
+
+# Streams a trace file into the output in frames of frame_size records, returning the count
+def send_trace(path, output, frame_size=DEFAULT_FRAME_SIZE):
+    sent = 0
+
+    for addresses, writes in _trace_batches(path):
+        for start in range(0, len(addresses), frame_size):
+            write_frame(
+                output, addresses[start : start + frame_size], writes[start : start + frame_size]
+            )
+
+        sent += len(addresses)
+
+    output.flush()
+
+    return sent
+
+
+# Reads frames from each stream in turn into a bounded queue, ending with None, or with the
+# exception that stopped it. put() blocks while the queue is full, which is the backpressure
+class FrameReader(threading.Thread):
+    def __init__(self, frame_queue, streams):
+        super().__init__(daemon=True)
+        self.frame_queue = frame_queue
+        self.streams = streams
+
+    def run(self):
+        try:
+            for stream in self.streams:
+                with stream:
+                    for frame in read_frames(stream):
+                        self.frame_queue.put(frame)
+        except (OSError, FrameError) as error:
+            self.frame_queue.put(error)
+            return
+
+        self.frame_queue.put(None)
+
+
+# Yields a buffered stream for each connection made to a Unix socket, one at a time
+def accept_connections(path, once=False):
+    if os.path.exists(path):
+        os.remove(path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        server.bind(path)
+        server.listen(1)
+
+        while True:
+            connection, _ = server.accept()
+            stream = connection.makefile("rb")
+            # The stream keeps its own reference, so the connection closes with it
+            connection.close()
+
+            yield stream
+
+            if once:
+                return
+    finally:
+        server.close()
+
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# Yields the pipe opened again for each writer, as every writer closing it ends the stream
+def open_pipe(path, once=False):
+    while True:
+        yield open(path, "rb")
+
+        if once:
+            return
+
+
+# Snapshots of the simulator's totals, reported as rates over a sliding window
+class RollingStats:
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        # (time, accesses, page faults, disk reads, disk writes), oldest first
+        self.samples = deque()
+
+    def sample(self, now, accesses, mmu):
+        self.samples.append(
+            (
+                now,
+                accesses,
+                mmu.get_total_page_faults(),
+                mmu.get_total_disk_reads(),
+                mmu.get_total_disk_writes(),
+            )
+        )
+
+        # Keep the newest sample at or before the start of the window, so it's always covered
+        while len(self.samples) > 2 and self.samples[1][0] <= now - self.window:
+            self.samples.popleft()
+
+    # Rates between the oldest and newest samples
+    def summary(self):
+        first = self.samples[0]
+        last = self.samples[-1]
+        seconds = last[0] - first[0]
+        accesses = last[1] - first[1]
+        page_faults = last[2] - first[2]
+
+        return {
+            "seconds": seconds,
+            "accesses": accesses,
+            "fault_rate": page_faults / accesses if accesses else 0.0,
+            "disk_reads_per_second": (last[3] - first[3]) / seconds if seconds else 0.0,
+            "disk_writes_per_second": (last[4] - first[4]) / seconds if seconds else 0.0,
+            "accesses_per_second": accesses / seconds if seconds else 0.0,
+        }
+
+
+class Server:
+    def __init__(
+        self, mmu, page_offset, interval=DEFAULT_INTERVAL, window=DEFAULT_WINDOW, stats_file=None
+    ):
+        self.mmu = mmu
+        self.page_offset = page_offset
+        self.interval = interval
+        self.stats = RollingStats(window)
+        self.stats_file = stats_file
+
+        self.accesses = 0
+        self.started = time.monotonic()
+        self.next_report = self.started + interval
+        self.stats.sample(self.started, 0, mmu)
+
+    # Replays frames from the queue until the reader finishes, reporting every interval
+    def run(self, frame_queue):
+        while True:
+            try:
+                frame = frame_queue.get(timeout=max(0.0, self.next_report - time.monotonic()))
+            except queue.Empty:
+                self.__report(frame_queue)
+                continue
+
+            if isinstance(frame, Exception):
+                raise frame
+
+            if frame is None:
+                return
+
+            # Take whatever else is already queued, up to a batch, into the same call
+            addresses = [frame[0]]
+            writes = [frame[1]]
+            records = len(frame[0])
+            ended = False
+            error = None
+
+            while records < BATCH_RECORDS:
+                try:
+                    frame = frame_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if frame is None:
+                    ended = True
+                    break
+
+                if isinstance(frame, Exception):
+                    error = frame
+                    break
+
+                addresses.append(frame[0])
+                writes.append(frame[1])
+                records += len(frame[0])
+
+            pages = np.concatenate(addresses) >> self.page_offset
+            self.mmu.process_batch(pages, np.concatenate(writes))
+            self.accesses += records
+
+            if time.monotonic() >= self.next_report:
+                self.__report(frame_queue)
+
+            if error is not None:
+                raise error
+
+            if ended:
+                return
+
+    def __report(self, frame_queue):
+        now = time.monotonic()
+        self.next_report = now + self.interval
+        self.stats.sample(now, self.accesses, self.mmu)
+        summary = self.stats.summary()
+
+        print(
+            f"[{now - self.started:8.1f}s] events: {self.accesses}"
+            f", fault rate: {summary['fault_rate']:.4f}"
+            f", disk reads/s: {summary['disk_reads_per_second']:.1f}"
+            f", disk writes/s: {summary['disk_writes_per_second']:.1f}"
+            f", events/s: {summary['accesses_per_second']:.0f}"
+            f", queued frames: {frame_queue.qsize()}",
+            flush=True,
+        )
+
+        if self.stats_file is not None:
+            with open(self.stats_file, "a") as f:
+                record = {"time": now - self.started, "events": self.accesses, **summary}
+                f.write(json.dumps(record) + "\n")
+
+    def print_totals(self):
+        print(f"events received: {self.accesses}")
+        print(f"total disk reads: {self.mmu.get_total_disk_reads()}")
+        print(f"total disk writes: {self.mmu.get_total_disk_writes()}")
+        print("page fault rate: ", end="")
+        page_faults = self.mmu.get_total_page_faults()
+        print("{0:.4f}".format(page_faults / self.accesses if self.accesses else 0.0))
+
+
+def _add_endpoint(parser):
+    endpoint = parser.add_mutually_exclusive_group(required=True)
+    endpoint.add_argument("--socket", help="Unix socket path")
+    endpoint.add_argument("--pipe", help="named pipe (FIFO) path")
+    endpoint.add_argument(
+        "stdio",
+        nargs="?",
+        choices=[STDIN_NAME],
+        help="- for stdin when serving, stdout when producing",
+    )
+
+
+def serve(args):
+    if args.policy in OFFLINE_POLICIES:
+        print(f"Policy {args.policy} needs the whole trace up front, so can't replay a stream")
+        return
+
+    try:
+        page_offset = page_offset_for(args.page_size)
+        mmu = create_mmu(args.policy, args.frames, args.seed)
+    except ValueError as error:
+        print(error)
+        return
+
+    if args.socket is not None:
+        streams = accept_connections(args.socket, args.once)
+    elif args.pipe is not None:
+        streams = open_pipe(args.pipe, args.once)
+    else:
+        streams = [sys.stdin.buffer]
+
+    frame_queue = queue.Queue(maxsize=args.queue_size)
+    reader = FrameReader(frame_queue, streams)
+    server = Server(mmu, page_offset, args.interval, args.window, args.stats_file)
+
+    reader.start()
+
+    try:
+        server.run(frame_queue)
+    except FrameError as error:
+        print(error)
+    except KeyboardInterrupt:
+        pass
+
+    # The reader thread may still be waiting for a connection, and won't clean up its socket
+    if args.socket is not None and os.path.exists(args.socket):
+        os.remove(args.socket)
+
+    server.print_totals()
+
+
+def produce(args):
+    try:
+        if args.socket is not None:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(args.socket)
+
+                with client.makefile("wb") as output:
+                    sent = send_trace(args.trace, output, args.frame_size)
+        elif args.pipe is not None:
+            with open(args.pipe, "wb") as output:
+                sent = send_trace(args.trace, output, args.frame_size)
+        else:
+            sent = send_trace(args.trace, sys.stdout.buffer, args.frame_size)
+    except FileNotFoundError as error:
+        print(f"Input '{error.filename}' could not be found", file=sys.stderr)
+        return
+    except (TraceFormatError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return
+    except BrokenPipeError:
+        print("The server stopped reading", file=sys.stderr)
+        return
+
+    print(f"events sent: {sent}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay traces streamed over a socket or pipe")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="replay frames as they arrive")
+    _add_endpoint(serve_parser)
+    serve_parser.add_argument("--frames", type=int, required=True, help="memory frames")
+    serve_parser.add_argument(
+        "--policy",
+        choices=[policy for policy in POLICIES if policy not in OFFLINE_POLICIES],
+        default="lru",
+    )
+    serve_parser.add_argument(
+        "--seed", type=int, default=None, help="seed for randomised policies"
+    )
+    serve_parser.add_argument(
+        "--page-size",
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        help=f"page size in bytes, a power of two (default: {DEFAULT_PAGE_SIZE})",
+    )
+    serve_parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help=f"seconds between statistics reports (default: {DEFAULT_INTERVAL})",
+    )
+    serve_parser.add_argument(
+        "--window",
+        type=float,
+        default=DEFAULT_WINDOW,
+        help=f"seconds of history each report covers (default: {DEFAULT_WINDOW})",
+    )
+    serve_parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f"frames buffered before the producer is held back (default: {DEFAULT_QUEUE_SIZE})",
+    )
+    serve_parser.add_argument(
+        "--stats-file", default=None, help="append reports here as JSON lines"
+    )
+    serve_parser.add_argument(
+        "--once", action="store_true", help="stop after the first connection or pipe writer"
+    )
+
+    produce_parser = commands.add_parser("produce", help="stream a trace file as frames")
+    produce_parser.add_argument("trace", help="trace file (plain, gzipped or binary)")
+    _add_endpoint(produce_parser)
+    produce_parser.add_argument(
+        "--frame-size",
+        type=int,
+        default=DEFAULT_FRAME_SIZE,
+        help=f"records per frame, at most {MAX_FRAME} (default: {DEFAULT_FRAME_SIZE})",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        if args.frames < 1:
+            parser.error("--frames must be at least 1")
+        if args.queue_size < 1:
+            parser.error("--queue-size must be at least 1")
+        if args.interval <= 0 or args.window <= 0:
+            parser.error("--interval and --window must be positive")
+
+        serve(args)
+    else:
+        if not 1 <= args.frame_size <= MAX_FRAME:
+            parser.error(f"--frame-size must be between 1 and {MAX_FRAME}")
+
+        produce(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,163 @@
-from clockmmu import ClockMMU
-from lrummu import LruMMU
-from randmmu import RandMMU
+from binarytrace import MAGIC, load_trace
+from diskmodel import DiskModel
+from instrumentation import Instruments, profiled
+from policies import DISK_POLICIES, OFFLINE_POLICIES, create_mmu
+from tlbmmu import TlbMMU
+from tracestream import (
+    DEFAULT_PAGE_SIZE,
+    STDIN_NAME,
+    TraceFormatError,
+    open_trace,
+    page_offset_for,
+    peek_magic,
+    read_batches,
+)
 
+import json
 import sys
 
+import numpy as np
+
+
+# Removes "--name value" from args, returning the value (None if the option isn't given)
+def pop_option(args, name):
+    if name not in args:
+        return None
+
+    index = args.index(name)
+
+    if index + 1 >= len(args):
+        raise ValueError(f"Option {name} needs a value")
+
+    value = args[index + 1]
+    del args[index : index + 2]
+
+    return value
+
+
+# Removes the flag "--name" from args, returning whether it was there
+def pop_flag(args, name):
+    if name not in args:
+        return False
+
+    args.remove(name)
+
+    return True
 
-def main():
-    PAGE_OFFSET = 12  # page is 2^12 = 4KB
 
+def main():
     ############################
     # Check input parameters   #
     ############################
 
-    if len(sys.argv) < 5:
+    argv = list(sys.argv)
+
+    # Optional instrumentation - counters and histograms written as JSON, and a cProfile dump
+    try:
+        stats_file = pop_option(argv, "--stats")
+        profile_file = pop_option(argv, "--profile")
+        # Optional TLB and page walk model, with settings overridden from a JSON file
+        tlb_config_file = pop_option(argv, "--tlb-config")
+        use_tlb = pop_flag(argv, "--tlb") or tlb_config_file is not None
+        # Optional disk latency model, with settings overridden from a JSON file
+        disk_config_file = pop_option(argv, "--disk-config")
+        use_disk = pop_flag(argv, "--disk") or disk_config_file is not None
+        # Page size in bytes, a power of two - 4KB unless given
+        page_size = pop_option(argv, "--page-size")
+        page_offset = page_offset_for(DEFAULT_PAGE_SIZE if page_size is None else int(page_size))
+    except ValueError as error:
+        print(error)
+        return
+
+    if len(argv) < 5:
         print(
-            "Usage: python memsim.py inputfile numberframes replacementmode debugmode"
+            "Usage: python memsim.py inputfile numberframes replacementmode debugmode [seed]"
+            " [--stats statsfile] [--profile profilefile] [--tlb] [--tlb-config configfile]"
+            " [--page-size bytes] [--disk] [--disk-config configfile]"
         )
         return
 
-    input_file = sys.argv[1]
+    input_file = argv[1]
 
     try:
-        with open(input_file, "r") as file:
-            # Read the trace file contents
-            trace_contents = file.readlines()
+        # Opened once here and streamed by the main loop, so the trace is only read a single time
+        trace_stream = open_trace(input_file)
     except FileNotFoundError:
         print(f"Input '{input_file}' could not be found")
         print(
-            "Usage: python memsim.py inputfile numberframes replacementmode debugmode"
+            "Usage: python memsim.py inputfile numberframes replacementmode debugmode [seed]"
+            " [--stats statsfile] [--profile profilefile] [--tlb] [--tlb-config configfile]"
+            " [--page-size bytes] [--disk] [--disk-config configfile]"
         )
         return
 
-    frames = int(sys.argv[2])
+    frames = int(argv[2])
     if frames < 1:
         print("Frame number must be at least 1\n")
         return
 
-    replacement_mode = sys.argv[3]
+    replacement_mode = argv[3]
+
+    # Optional seed, making the rand replacement mode reproducible
+    seed = None
+    if len(argv) > 5:
+        try:
+            seed = int(argv[5])
+        except ValueError:
+            print("Seed must be an integer")
+            return
 
     # Setup MMU based on replacement mode
-    if replacement_mode == "rand":
-        mmu = RandMMU(frames)
-    elif replacement_mode == "lru":
-        mmu = LruMMU(frames)
-    elif replacement_mode == "clock":
-        mmu = ClockMMU(frames)
-    else:
-        print("Invalid replacement mode. Valid options are [rand, lru, esc]")
+    try:
+        mmu = create_mmu(replacement_mode, frames, seed)
+    except ValueError as error:
+        print(error)
         return
 
-    debug_mode = sys.argv[4]
+    disk = None
+
+    if use_disk:
+        if replacement_mode not in DISK_POLICIES:
+            supported = ", ".join(sorted(DISK_POLICIES))
+            print(f"The disk model supports the [{supported}] replacement modes")
+            return
+
+        disk_config = {}
+
+        if disk_config_file is not None:
+            try:
+                with open(disk_config_file, "r") as f:
+                    disk_config = json.load(f)
+            except (OSError, ValueError) as error:
+                print(f"Disk config '{disk_config_file}' could not be read: {error}")
+                return
+
+        try:
+            disk = DiskModel(**disk_config)
+        except ValueError as error:
+            print(error)
+            return
+
+        mmu.set_disk(disk)
+
+    if use_tlb:
+        tlb_config = {}
+
+        if tlb_config_file is not None:
+            try:
+                with open(tlb_config_file, "r") as f:
+                    tlb_config = json.load(f)
+            except (OSError, ValueError) as error:
+                print(f"TLB config '{tlb_config_file}' could not be read: {error}")
+                return
+
+        try:
+            mmu = TlbMMU(mmu, **tlb_config)
+        except ValueError as error:
+            print(error)
+            return
+
+    debug_mode = argv[4]
 
     # Set debug mode
     if debug_mode == "debug":
@@ -66,31 +174,84 @@ def main():
 
     no_events = 0
 
-    with open(input_file, "r") as trace_file:
-        for trace_line in trace_file:
-            trace_cmd = trace_line.strip().split(" ")
-            logical_address = int(trace_cmd[0], 16)
-            page_number = logical_address >> PAGE_OFFSET
-
-            # Process read or write
-            if trace_cmd[1] == "R":
-                mmu.read_memory(page_number)
-            elif trace_cmd[1] == "W":
-                mmu.write_memory(page_number)
-            else:
-                print(f"Badly formatted file. Error on line {no_events + 1}")
-                return
+    with trace_stream:
+        binary_input = peek_magic(trace_stream, len(MAGIC)) == MAGIC
 
-            no_events += 1
+        if binary_input and input_file == STDIN_NAME:
+            print("Binary traces must be given as a file, not on stdin")
+            return
+
+        if binary_input:
+            # Memory-mapped binary trace - decode every page number in one vectorised shift
+            addresses, writes = load_trace(input_file)
+            batches = [(addresses >> page_offset, writes)]
+        else:
+            batches = read_batches(trace_stream, page_offset)
+
+        instruments = None
+
+        if stats_file is not None:
+            instruments = Instruments()
+            mmu.set_instruments(instruments)
+
+        try:
+            with profiled(profile_file):
+                if replacement_mode in OFFLINE_POLICIES:
+                    # The policy looks ahead, so the whole trace is decoded before replay starts
+                    batches = list(batches)
+                    mmu.set_trace(np.concatenate([pages for pages, _ in batches]))
+
+                for pages, writes in batches:
+                    # Process the reads and writes of each decoded block in one call
+                    if instruments is None:
+                        mmu.process_batch(pages, writes)
+                    else:
+                        instruments.run_batch(mmu, pages, writes)
+                    no_events += len(pages)
+        except TraceFormatError as error:
+            print(error)
+            return
+
+    if instruments is not None:
+        instruments.write_json(stats_file)
 
     # TODO: Print results
     print(f"total memory frames: {frames}")
+    if page_size is not None:
+        print(f"page size: {page_size} bytes")
     print(f"events in trace: {no_events}")
-    print(f"total disk reads: {mmu.get_total_disk_reads()}")
-    print(f"total disk writes: {mmu.get_total_disk_writes()}")
+    # The totals are every read and write the disk serves. With a disk model, faults on
+    # prefetched pages read nothing more, while the prefetches and the page cleaner's writes
+    # are disk traffic the MMU never sees
+    disk_reads = mmu.get_total_disk_reads()
+    disk_writes = mmu.get_total_disk_writes()
+
+    if disk is not None:
+        disk_reads += disk.prefetch_reads - disk.prefetch_hits
+        disk_writes += disk.cleaner_writes
+
+    print(f"total disk reads: {disk_reads}")
+    print(f"total disk writes: {disk_writes}")
     print("page fault rate: ", end="")
     print("{0:.4f}".format(mmu.get_total_page_faults() / no_events))
 
+    if use_tlb:
+        print(f"tlb accesses: {mmu.accesses}")
+        print(f"l1 tlb hits: {mmu.l1_hits}")
+        print(f"l2 tlb hits: {mmu.l2_hits}")
+        print(f"page walks: {mmu.walks}")
+        print(f"page walk memory references: {mmu.walk_references}")
+        print("effective access time (ns): {0:.2f}".format(mmu.effective_access_time()))
+
+    if disk is not None:
+        print(f"page cleaner disk writes (in the total): {disk.cleaner_writes}")
+        print(f"prefetch disk reads (in the total): {disk.prefetch_reads}")
+        print(f"page faults served by a prefetch: {disk.prefetch_hits}")
+        print("total stall time (ms): {0:.3f}".format(disk.stall_ns / 1e6))
+        print("  waiting on reads (ms): {0:.3f}".format(disk.read_stall_ns / 1e6))
+        print("  waiting for queue room (ms): {0:.3f}".format(disk.queue_stall_ns / 1e6))
+        print("simulated run time (ms): {0:.3f}".format(disk.elapsed_ns(no_events) / 1e6))
+
 
 if __name__ == "__main__":
     main()
@@ -7,19 +7,77 @@
 * for the MMU.
 *
 '''
+
+
+# Converts a NumPy array (or any iterable) into a plain list, which is much faster to loop over
+def to_list(values):
+    if isinstance(values, list):
+        return values
+
+    if hasattr(values, "tolist"):
+        return values.tolist()
+
+    return list(values)
+
+
+# Frames that have never been filled, as a stack that pops the lowest frame first - the order
+# LruMMU fills them in, so every policy starts out with the same page table
+def free_frame_stack(frames):
+    return list(range(frames - 1, -1, -1))
+
+
 class MMU:
+    # Set by set_instruments() - policies record extra detail on their miss path when it isn't None
+    instruments = None
+    # Set by set_disk() - policies in policies.DISK_POLICIES time their disk I/O with it
+    disk = None
+
     def read_memory(self, page_number):
         pass
 
     def write_memory(self, page_number):
         pass
 
+    # Processes a batch of accesses - pages[i] is read, or written if writes[i] is true.
+    # Subclasses override this with a tighter loop than one method call per access
+    def process_batch(self, pages, writes):
+        for page_number, write in zip(to_list(pages), to_list(writes)):
+            if write:
+                self.write_memory(page_number)
+            else:
+                self.read_memory(page_number)
+
+    def set_instruments(self, instruments):
+        self.instruments = instruments
+
+    def set_disk(self, disk):
+        self.disk = disk
+        disk.attach(self)
+
     def set_debug(self):
         pass
 
     def reset_debug(self):
         pass
 
+    def _log_debug_message(self, msg):
+        print(f"{self.logical_time}: {msg}")
+
+    # Writes back the page in frame_num if it's dirty, leaving the frame clean. Policies call it
+    # on eviction, before the frame is reused
+    def _write_back(self, frame_num):
+        if self.dirty_bits[frame_num] == 1:
+            self.total_disk_writes += 1
+            self.dirty_bits[frame_num] = 0
+
+            if self.disk is not None:
+                self.disk.write_back(self.page_table[frame_num], self.logical_time)
+
+            if self.debug_mode:
+                self._log_debug_message(
+                    f"Page {self.page_table[frame_num]} (frame {frame_num}) dirty - wrote to disk"
+                )
+
     def get_total_disk_reads(self):
         return -1
 
@@ -0,0 +1,431 @@
+'''
+* Multi-process replay.
+* Several traces are merged into one access stream as if each were a process
+* on the same host, sharing its physical frames. The merge is a scheduler
+* over the traces' batch streams: each turn a process runs for a quantum of
+* accesses (times its weight, for weighted scheduling), so no more than one
+* quantum per process is ever held in memory and the merged trace is never
+* built.
+*
+* Frames are shared in one of three ways:
+*   - global: one MMU holds every process's pages, tagged with the process
+*     ID so equal page numbers in different processes stay distinct, and
+*     evicts across processes
+*   - fixed: each process gets its own MMU with a share of the frames in
+*     proportion to its weight
+*   - pff: per-process MMUs whose allocations follow the page-fault
+*     frequency (PFF) of each process. Every PFF_INTERVAL accesses a process
+*     faulting above the upper bound is given more frames - from the free
+*     pool, or else from the process faulting least - and one below the
+*     lower bound gives some back
+*
+* Policies don't support changing their frame count, so a process whose
+* allocation changes gets a new MMU of the new size, warmed by replaying its
+* most recent accesses. Faults and write-backs while warming aren't counted,
+* and dirty pages dropped with the old MMU aren't written back.
+*
+* In global mode page faults are charged to the process that took them, and
+* so are the write-backs they cause, whichever process dirtied the page.
+*
+* Usage: python multitenant.py tracefile [tracefile ...] --frames N
+*                              [--policy lru] [--mode global|fixed|pff]
+*                              [--quantum N] [--weights W ...] [--seed N]
+*                              [--page-size BYTES]
+*
+'''
+import argparse
+import os
+from contextlib import ExitStack
+
+import numpy as np
+
+from binarytrace import MAGIC, load_trace
+from policies import OFFLINE_POLICIES, POLICIES, create_mmu
+from tracestream import (
+    DEFAULT_PAGE_SIZE,
+    STDIN_NAME,
+    TraceFormatError,
+    open_trace,
+    page_offset_for,
+    peek_magic,
+    read_batches,
+)
+
+MODES = ["global", "fixed", "pff"]
+DEFAULT_QUANTUM = 1000  # accesses a process runs per turn, times its weight
+BINARY_BATCH = 1 << 18  # accesses taken from a memory-mapped binary trace at a time
+PID_SHIFT = 64  # process IDs go above the 64 page number bits in global mode
+
+PFF_INTERVAL = 10000  # accesses of a process between PFF decisions
+PFF_UPPER = 0.01  # faults per access above which a process gets more frames
+PFF_LOWER = 0.001  # faults per access below which a process gives frames back
+PFF_STEP = 0.1  # share of a process's frames given or taken at a time
+WARM_MULTIPLE = 4  # recent accesses replayed into a resized MMU, as a multiple of its frames
+
+
+# Yields (pages, writes) batches of a trace, opened on stack. Binary traces are memory-mapped
+# and sliced, so neither kind is read into memory whole
+def open_batches(path, page_offset, stack):
+    stream = stack.enter_context(open_trace(path))
+
+    if peek_magic(stream, len(MAGIC)) != MAGIC:
+        return read_batches(stream, page_offset)
+
+    if path == STDIN_NAME:
+        raise ValueError("Binary traces must be given as a file, not on stdin")
+
+    addresses, writes = load_trace(path)
+
+    return (
+        (
+            addresses[start : start + BINARY_BATCH] >> page_offset,
+            writes[start : start + BINARY_BATCH],
+        )
+        for start in range(0, len(addresses), BINARY_BATCH)
+    )
+
+
+# Merges the processes' batch streams, yielding (pid, pages, writes) for each turn. Each process
+# runs quantum * weights[pid] accesses a turn, in round-robin order, until its trace runs out
+def interleave(sources, quantum=DEFAULT_QUANTUM, weights=None):
+    if weights is None:
+        weights = [1] * len(sources)
+
+    sources = [iter(source) for source in sources]
+    # The unused rest of each process's current batch
+    pending = [(np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=bool)) for _ in sources]
+    active = list(range(len(sources)))
+
+    while active:
+        for pid in list(active):
+            wanted = quantum * weights[pid]
+            page_parts = []
+            write_parts = []
+            taken = 0
+
+            while taken < wanted:
+                pages, writes = pending[pid]
+
+                if len(pages) == 0:
+                    batch = next(sources[pid], None)
+
+                    if batch is None:
+                        active.remove(pid)
+                        break
+
+                    pending[pid] = batch
+                    continue
+
+                count = min(wanted - taken, len(pages))
+                page_parts.append(pages[:count])
+                write_parts.append(writes[:count])
+                pending[pid] = (pages[count:], writes[count:])
+                taken += count
+
+            if taken > 0:
+                yield pid, np.concatenate(page_parts), np.concatenate(write_parts)
+
+
+# Frames for each process in proportion to its weight, at least one each
+def partition_frames(frames, weights):
+    if frames < len(weights):
+        raise ValueError(f"{frames} frames can't be partitioned between {len(weights)} processes")
+
+    total = sum(weights)
+    shares = [max(1, frames * weight // total) for weight in weights]
+
+    # Hand the frames lost to rounding down out one at a time, heaviest processes first
+    order = sorted(range(len(weights)), key=lambda pid: -weights[pid])
+    index = 0
+
+    while sum(shares) < frames:
+        shares[order[index % len(order)]] += 1
+        index += 1
+
+    while sum(shares) > frames:
+        pid = max(range(len(shares)), key=lambda pid: shares[pid])
+        shares[pid] -= 1
+
+    return shares
+
+
+# Tags each page with its process ID, so one MMU can hold every process's pages. The tagged
+# page numbers are wider than any NumPy integer, so they're returned as a list of Python ints
+def tag_pages(pages, pid):
+    tag = pid << PID_SHIFT
+
+    return [page_number | tag for page_number in pages.tolist()]
+
+
+class ProcessStats:
+    def __init__(self, name):
+        self.name = name
+        self.accesses = 0
+        self.page_faults = 0
+        self.disk_reads = 0
+        self.disk_writes = 0
+        self.frames = None
+
+    # Runs the batch on mmu, charging this process with the faults and I/O it caused
+    def run(self, mmu, pages, writes):
+        page_faults = mmu.get_total_page_faults()
+        disk_reads = mmu.get_total_disk_reads()
+        disk_writes = mmu.get_total_disk_writes()
+
+        mmu.process_batch(pages, writes)
+
+        self.accesses += len(pages)
+        self.page_faults += mmu.get_total_page_faults() - page_faults
+        self.disk_reads += mmu.get_total_disk_reads() - disk_reads
+        self.disk_writes += mmu.get_total_disk_writes() - disk_writes
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "accesses": self.accesses,
+            "frames": self.frames,
+            "page_faults": self.page_faults,
+            "fault_rate": self.page_faults / self.accesses * 100 if self.accesses else 0.0,
+            "disk_reads": self.disk_reads,
+            "disk_writes": self.disk_writes,
+        }
+
+
+# Recent accesses of one process, kept to warm a replacement MMU
+class AccessHistory:
+    def __init__(self, limit):
+        self.limit = limit
+        self.pages = np.zeros(0, dtype=np.uint64)
+        self.writes = np.zeros(0, dtype=bool)
+
+    def add(self, pages, writes):
+        self.pages = np.concatenate([self.pages, pages])[-self.limit :]
+        self.writes = np.concatenate([self.writes, writes])[-self.limit :]
+
+
+# Runs per-process MMUs whose frame allocations follow each process's page-fault frequency
+class PffPartitioner:
+    def __init__(
+        self,
+        policy,
+        frames,
+        weights,
+        seed=None,
+        interval=PFF_INTERVAL,
+        upper=PFF_UPPER,
+        lower=PFF_LOWER,
+    ):
+        self.policy = policy
+        self.seed = seed
+        self.interval = interval
+        self.upper = upper
+        self.lower = lower
+
+        self.allocations = partition_frames(frames, weights)
+        self.free_frames = 0
+        self.mmus = [create_mmu(policy, allocation, seed) for allocation in self.allocations]
+        self.histories = [AccessHistory(WARM_MULTIPLE * frames) for _ in weights]
+
+        # Accesses and faults of each process since its last PFF decision
+        self.window_accesses = [0] * len(weights)
+        self.window_faults = [0] * len(weights)
+        # Fault frequency of each process over its last full window
+        self.fault_rates = [0.0] * len(weights)
+
+        self.resizes = 0
+
+    def run(self, pid, stats, pages, writes):
+        page_faults = stats.page_faults
+        stats.run(self.mmus[pid], pages, writes)
+
+        self.histories[pid].add(pages, writes)
+        self.window_accesses[pid] += len(pages)
+        self.window_faults[pid] += stats.page_faults - page_faults
+
+        if self.window_accesses[pid] >= self.interval:
+            self.fault_rates[pid] = self.window_faults[pid] / self.window_accesses[pid]
+            self.window_accesses[pid] = 0
+            self.window_faults[pid] = 0
+            self.__adjust(pid)
+
+    # Grows or shrinks the process's allocation according to its fault frequency
+    def __adjust(self, pid):
+        step = max(1, int(self.allocations[pid] * PFF_STEP))
+
+        if self.fault_rates[pid] > self.upper:
+            if self.free_frames == 0:
+                self.__reclaim(pid, step)
+
+            grant = min(step, self.free_frames)
+
+            if grant > 0:
+                self.free_frames -= grant
+                self.__resize(pid, self.allocations[pid] + grant)
+        elif self.fault_rates[pid] < self.lower and self.allocations[pid] > 1:
+            release = min(step, self.allocations[pid] - 1)
+            self.free_frames += release
+            self.__resize(pid, self.allocations[pid] - release)
+
+    # Takes up to count frames into the free pool from the process faulting least
+    def __reclaim(self, pid, count):
+        donors = [
+            other
+            for other in range(len(self.allocations))
+            if other != pid
+            and self.allocations[other] > 1
+            and self.fault_rates[other] < self.fault_rates[pid]
+        ]
+
+        if not donors:
+            return
+
+        donor = min(donors, key=lambda other: self.fault_rates[other])
+        taken = min(count, self.allocations[donor] - 1)
+        self.free_frames += taken
+        self.__resize(donor, self.allocations[donor] - taken)
+
+    # Replaces the process's MMU with one of the new size, warmed with its recent accesses
+    def __resize(self, pid, frames):
+        history = self.histories[pid]
+        warm = WARM_MULTIPLE * frames
+        mmu = create_mmu(self.policy, frames, self.seed)
+        mmu.process_batch(history.pages[-warm:], history.writes[-warm:])
+
+        # ProcessStats charges deltas, so the warm-up's own faults and write-backs never count
+        self.mmus[pid] = mmu
+        self.allocations[pid] = frames
+        self.resizes += 1
+
+
+# Replays the traces as processes sharing frames, returning per-process results and the
+# number of PFF resizes
+def run_processes(
+    sources, names, frames, policy, mode="global", quantum=DEFAULT_QUANTUM, weights=None, seed=None
+):
+    if policy in OFFLINE_POLICIES:
+        raise ValueError(
+            f"Policy {policy} needs the whole trace up front, so can't replay a merged stream"
+        )
+    if mode not in MODES:
+        raise ValueError(f"Invalid mode. Valid options are [{', '.join(MODES)}]")
+
+    if weights is None:
+        weights = [1] * len(sources)
+
+    stats = [ProcessStats(name) for name in names]
+    resizes = 0
+
+    if mode == "global":
+        mmu = create_mmu(policy, frames, seed)
+
+        for pid, pages, writes in interleave(sources, quantum, weights):
+            stats[pid].run(mmu, tag_pages(pages, pid), writes)
+    elif mode == "fixed":
+        allocations = partition_frames(frames, weights)
+        mmus = [create_mmu(policy, allocation, seed) for allocation in allocations]
+
+        for pid, pages, writes in interleave(sources, quantum, weights):
+            stats[pid].run(mmus[pid], pages, writes)
+
+        for process, allocation in zip(stats, allocations):
+            process.frames = allocation
+    else:
+        partitioner = PffPartitioner(policy, frames, weights, seed)
+
+        for pid, pages, writes in interleave(sources, quantum, weights):
+            partitioner.run(pid, stats[pid], pages, writes)
+
+        for process, allocation in zip(stats, partitioner.allocations):
+            process.frames = allocation
+
+        resizes = partitioner.resizes
+
+    return [process.to_dict() for process in stats], resizes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay several traces as processes sharing frames"
+    )
+    parser.add_argument("traces", nargs="+", help="trace files, one per process")
+    parser.add_argument("--frames", type=int, required=True, help="frames shared by every process")
+    parser.add_argument(
+        "--policy",
+        choices=[policy for policy in POLICIES if policy not in OFFLINE_POLICIES],
+        default="lru",
+    )
+    parser.add_argument("--mode", choices=MODES, default="global", help="how frames are shared")
+    parser.add_argument(
+        "--quantum",
+        type=int,
+        default=DEFAULT_QUANTUM,
+        help=f"accesses a process runs per turn (default: {DEFAULT_QUANTUM})",
+    )
+    parser.add_argument(
+        "--weights", nargs="+", type=int, default=None, help="scheduling weight of each process"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="seed for randomised policies")
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        help=f"page size in bytes, a power of two (default: {DEFAULT_PAGE_SIZE})",
+    )
+    args = parser.parse_args()
+
+    if args.weights is not None and len(args.weights) != len(args.traces):
+        parser.error("--weights needs one weight per trace")
+    if args.weights is not None and min(args.weights) < 1:
+        parser.error("--weights must be positive")
+    if args.quantum < 1:
+        parser.error("--quantum must be at least 1")
+
+    try:
+        page_offset = page_offset_for(args.page_size)
+    except ValueError as error:
+        parser.error(str(error))
+
+    names = [os.path.basename(trace) for trace in args.traces]
+
+    try:
+        with ExitStack() as stack:
+            sources = [open_batches(trace, page_offset, stack) for trace in args.traces]
+            results, resizes = run_processes(
+                sources,
+                names,
+                args.frames,
+                args.policy,
+                args.mode,
+                args.quantum,
+                args.weights,
+                args.seed,
+            )
+    except FileNotFoundError as error:
+        print(f"Input '{error.filename}' could not be found")
+        return
+    except (TraceFormatError, ValueError) as error:
+        print(error)
+        return
+
+    accesses = sum(result["accesses"] for result in results)
+    page_faults = sum(result["page_faults"] for result in results)
+
+    print(f"total memory frames: {args.frames}")
+    print(f"policy: {args.policy}, {args.mode} replacement")
+
+    for pid, result in enumerate(results):
+        frames = "" if result["frames"] is None else f", {result['frames']} frames"
+        print(f"| process {pid} ({result['name']}){frames}")
+        print(f"|   events: {result['accesses']}")
+        print(f"|   page faults: {result['page_faults']} ({result['fault_rate']:.4f}%)")
+        print(f"|   disk reads: {result['disk_reads']}, disk writes: {result['disk_writes']}")
+
+    if args.mode == "pff":
+        print(f"frame reallocations: {resizes}")
+
+    print(f"events in all traces: {accesses}")
+    print("page fault rate: {0:.4f}".format(page_faults / accesses if accesses else 0.0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import heapq
+
+import numpy as np
+
+from mmu import MMU, free_frame_stack, to_list
+
+COMPACT_MULTIPLE = 4  # heap entries allowed per frame before stale entries are cleared out
+
+
+# Position of the next access to the same page for every access, or len(pages) if there isn't
+# one - a backward pass done as a stable sort, so each page's accesses end up adjacent in order
+def next_uses(pages):
+    pages = np.asarray(pages)
+    count = len(pages)
+    order = np.argsort(pages, kind="stable")
+
+    next_use = np.full(count, count, dtype=np.int64)
+    same_page = pages[order[1:]] == pages[order[:-1]]
+    next_use[order[:-1][same_page]] = order[1:][same_page]
+
+    return next_use
+
+
+# Belady's OPT (MIN) - evicts the resident page whose next use is furthest in the future, which
+# gives the fewest page faults possible. It needs the whole trace up front, so set_trace() must
+# be given every page number before any access is replayed. Resident pages are kept in a heap
+# keyed on their next use, with entries made stale by later accesses skipped when popped.
+# With dirty_aware, pages that are never used again are evicted clean ones first, saving the
+# write-back a dirty one would cost
+class OptMMU(MMU):
+    def __init__(self, frames, dirty_aware=False):
+        self.frames = frames
+        self.dirty_aware = dirty_aware
+        self.page_table = [None] * frames
+        self.dirty_bits = [0] * frames
+
+        # Resident page -> frame, and the position of its next use
+        self.page_frames = {}
+        self.page_next_use = {}
+        # (-next use, dirty, page) of every resident page, plus stale entries
+        self.heap = []
+
+        self.free_frames = free_frame_stack(frames)
+
+        self.next_use = None
+        self.position = 0
+
+        self.total_disk_reads = 0
+        self.total_disk_writes = 0
+        self.total_page_faults = 0
+
+        self.debug_mode = False
+
+    def set_debug(self):
+        self.debug_mode = True
+
+    def reset_debug(self):
+        self.debug_mode = False
+
+    # Must be called with the page number of every access, in order, before replaying them.
+    # MMUs replaying the same trace can share one next_uses(pages) list, passed as next_use
+    def set_trace(self, pages, next_use=None):
+        self.next_use = next_uses(pages).tolist() if next_use is None else next_use
+        self.position = 0
+
+    # Accesses replayed so far, which the other MMUs call their logical time
+    @property
+    def logical_time(self):
+        return self.position
+
+    # Records the page's next use, pushing a fresh heap entry for it
+    def __schedule(self, page_number, next_use, frame_num):
+        self.page_next_use[page_number] = next_use
+        dirty = self.dirty_bits[frame_num] if self.dirty_aware else 0
+        heapq.heappush(self.heap, (-next_use, dirty, page_number))
+
+        if len(self.heap) > COMPACT_MULTIPLE * self.frames + 16:
+            self.__compact()
+
+    # Rebuilds the heap from the resident pages alone, dropping every stale entry
+    def __compact(self):
+        self.heap = [
+            (-next_use, self.dirty_bits[self.page_frames[page]] if self.dirty_aware else 0, page)
+            for page, next_use in self.page_next_use.items()
+        ]
+        heapq.heapify(self.heap)
+
+    # Returns a free frame, or the frame of the page used furthest in the future
+    def __get_replaceable_frame(self):
+        if self.free_frames:
+            return self.free_frames.pop()
+
+        while True:
+            negative_next_use, _, page_number = heapq.heappop(self.heap)
+
+            if self.page_next_use.get(page_number) == -negative_next_use:
+                break
+
+        del self.page_next_use[page_number]
+        frame_num = self.page_frames.pop(page_number)
+
+        self._write_back(frame_num)
+
+        return frame_num
+
+    # Simulates reading from page page_number, and writing to page_number if write is true
+    def __get_page(self, page_number, write):
+        next_use = self.next_use[self.position]
+        self.position += 1
+
+        self.__access(page_number, write, next_use, self.page_frames.get(page_number))
+
+    # frame_num is the page's frame, or None if it isn't resident
+    def __access(self, page_number, write, next_use, frame_num):
+        if frame_num is None:
+            self.__load_page(page_number, write, next_use)
+            return
+
+        if write:
+            self.dirty_bits[frame_num] = 1
+
+        self.__schedule(page_number, next_use, frame_num)
+
+    def __load_page(self, page_number, write, next_use):
+        frame_num = self.__get_replaceable_frame()
+
+        if self.debug_mode:
+            self._log_debug_message(
+                f"Replacing page {self.page_table[frame_num]} (frame {frame_num}) with page {page_number}..."
+            )
+
+        self.total_disk_reads += 1
+        self.total_page_faults += 1
+
+        self.page_table[frame_num] = page_number
+        self.page_frames[page_number] = frame_num
+
+        if write:
+            self.dirty_bits[frame_num] = 1
+
+        self.__schedule(page_number, next_use, frame_num)
+
+    def process_batch(self, pages, writes):
+        page_frames = self.page_frames
+        page_next_use = self.page_next_use
+        dirty_bits = self.dirty_bits
+        next_uses_list = self.next_use
+        dirty_aware = self.dirty_aware
+        heap = self.heap
+        heap_limit = COMPACT_MULTIPLE * self.frames + 16
+        position = self.position
+
+        for page_number, write in zip(to_list(pages), to_list(writes)):
+            next_use = next_uses_list[position]
+            position += 1
+            frame_num = page_frames.get(page_number)
+
+            # Misses, and hits that would make the heap due for compaction, take the slow path
+            if frame_num is None or len(heap) >= heap_limit:
+                self.position = position
+                self.__access(page_number, write, next_use, frame_num)
+                heap = self.heap
+                continue
+
+            if write:
+                dirty_bits[frame_num] = 1
+
+            page_next_use[page_number] = next_use
+            dirty = dirty_bits[frame_num] if dirty_aware else 0
+            heapq.heappush(heap, (-next_use, dirty, page_number))
+
+        self.position = position
+
+    def read_memory(self, page_number):
+        self.__get_page(page_number=page_number, write=False)
+
+    def write_memory(self, page_number):
+        self.__get_page(page_number=page_number, write=True)
+
+    def get_total_disk_reads(self):
+        return self.total_disk_reads
+
+    def get_total_disk_writes(self):
+        return self.total_disk_writes
+
+    def get_total_page_faults(self):
+        return self.total_page_faults
+
+
+# OPT that evicts clean pages before dirty ones among those never used again
+class DirtyOptMMU(OptMMU):
+    def __init__(self, frames):
+        super().__init__(frames, dirty_aware=True)
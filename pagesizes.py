@@ -0,0 +1,350 @@
+'''
+* Page-size studies.
+* The trace is decoded once, to raw addresses, and every page size is then a
+* single vectorised shift of that array, so adding page sizes doesn't mean
+* re-reading the trace.
+*
+* Two modes:
+*   - replay_page_sizes() replays the same memory, in bytes, at each page
+*     size with any registered policy - larger pages mean fewer frames
+*   - MixedPageMMU manages 4K and 2M pages together in one LRU ordering.
+*     Memory starts out in 4K pages, and a 2M region is promoted to a huge
+*     page once enough of its 4K pages have faulted (reservation-style
+*     promotion). Promotion folds the region's resident 4K pages into the
+*     huge page and reads in the rest. Huge pages are never demoted
+*
+* Fault rates and disk I/O in bytes are reported per page size.
+*
+* Usage: python pagesizes.py tracefile --memory BYTES [--policy lru]
+*                            [--page-sizes 4096 2097152 ...] [--seed N]
+*                            [--mixed] [--promotion-threshold FRACTION]
+*
+'''
+import argparse
+import os
+from collections import OrderedDict
+
+from binarytrace import binary_path, is_binary_trace, load_trace
+from mmu import MMU, to_list
+from policies import OFFLINE_POLICIES, POLICIES, create_mmu
+from tracestream import (
+    ADDRESS_PAGE_SIZE,
+    DEFAULT_PAGE_SIZE,
+    STDIN_NAME,
+    load_pages,
+    page_offset_for,
+)
+
+SMALL_PAGE_SIZE = DEFAULT_PAGE_SIZE
+HUGE_PAGE_SIZE = 2 * 1024 * 1024
+DEFAULT_PAGE_SIZES = [SMALL_PAGE_SIZE, 64 * 1024, HUGE_PAGE_SIZE]
+DEFAULT_PROMOTION_THRESHOLD = 0.5  # share of a region's 4K pages that must fault before promotion
+
+
+# Raw byte addresses and write flags of a trace, from its binary form when it has one
+def load_addresses(trace_fp):
+    if trace_fp != STDIN_NAME:
+        if is_binary_trace(trace_fp):
+            return load_trace(trace_fp)
+
+        if os.path.exists(binary_path(trace_fp)):
+            return load_trace(binary_path(trace_fp))
+
+    return load_pages(trace_fp, ADDRESS_PAGE_SIZE)
+
+
+# Page numbers of every access at each page size, as {page_size: pages}
+def decode_page_sizes(addresses, page_sizes):
+    return {page_size: addresses >> page_offset_for(page_size) for page_size in page_sizes}
+
+
+def _size_result(page_size, frames, events, page_faults, disk_reads, disk_writes):
+    return {
+        "page_size": page_size,
+        "frames": frames,
+        "page_faults": page_faults,
+        "fault_rate": page_faults / events * 100 if events else 0.0,
+        "read_bytes": disk_reads * page_size,
+        "write_bytes": disk_writes * page_size,
+    }
+
+
+# Replays memory_bytes of memory at each page size under one policy, returning a result per
+# page size. Page sizes too large for even one frame are left out
+def replay_page_sizes(addresses, writes, page_sizes, policy, memory_bytes, seed=None):
+    results = []
+
+    for page_size, pages in decode_page_sizes(addresses, page_sizes).items():
+        frames = memory_bytes // page_size
+
+        if frames < 1:
+            continue
+
+        mmu = create_mmu(policy, frames, seed)
+
+        if policy in OFFLINE_POLICIES:
+            mmu.set_trace(pages)
+
+        mmu.process_batch(pages, writes)
+
+        results.append(
+            _size_result(
+                page_size,
+                frames,
+                len(pages),
+                mmu.get_total_page_faults(),
+                mmu.get_total_disk_reads(),
+                mmu.get_total_disk_writes(),
+            )
+        )
+
+    return results
+
+
+class MixedPageMMU(MMU):
+    # Pages are numbered in small pages. memory_bytes is the memory shared by both page sizes
+    def __init__(
+        self,
+        memory_bytes,
+        promotion_threshold=DEFAULT_PROMOTION_THRESHOLD,
+        small_size=SMALL_PAGE_SIZE,
+        huge_size=HUGE_PAGE_SIZE,
+    ):
+        self.small_size = small_size
+        self.huge_size = huge_size
+        self.region_shift = page_offset_for(huge_size // small_size)
+        self.pages_per_region = huge_size // small_size
+        self.promotion_count = max(1, int(promotion_threshold * self.pages_per_region))
+
+        # Memory in small-page units, and how many of them are in use
+        self.capacity = memory_bytes // small_size
+        self.used = 0
+
+        if self.capacity < 1:
+            raise ValueError(f"Memory must hold at least one {small_size}-byte page")
+
+        # Huge pages only fit if memory holds at least one
+        self.can_promote = self.capacity >= self.pages_per_region
+
+        # Resident pages, least recently used first - small pages keyed by page number and
+        # huge pages by -(region + 1), so the two never collide - mapped to their dirty bit
+        self.resident = OrderedDict()
+        self.promoted = set()
+        # Small pages of each region that have faulted, and those of them still resident
+        self.faulted = {}
+        self.region_resident = {}
+
+        self.small_faults = 0
+        self.small_writes = 0
+        self.huge_faults = 0
+        self.huge_writes = 0
+        self.promotions = 0
+        self.read_bytes = {small_size: 0, huge_size: 0}
+        self.write_bytes = {small_size: 0, huge_size: 0}
+
+        self.debug_mode = False
+
+    def set_debug(self):
+        self.debug_mode = True
+
+    def reset_debug(self):
+        self.debug_mode = False
+
+    def read_memory(self, page_number):
+        self.__access(page_number, False)
+
+    def write_memory(self, page_number):
+        self.__access(page_number, True)
+
+    def process_batch(self, pages, writes):
+        resident = self.resident
+        promoted = self.promoted
+        region_shift = self.region_shift
+
+        for page_number, write in zip(to_list(pages), to_list(writes)):
+            region = page_number >> region_shift
+            key = -(region + 1) if region in promoted else page_number
+
+            if key in resident:
+                resident.move_to_end(key)
+
+                if write:
+                    resident[key] = True
+
+                continue
+
+            self.__access(page_number, write)
+
+    def __access(self, page_number, write):
+        region = page_number >> self.region_shift
+        key = -(region + 1) if region in self.promoted else page_number
+
+        if key in self.resident:
+            self.resident.move_to_end(key)
+
+            if write:
+                self.resident[key] = True
+
+            return
+
+        if region in self.promoted:
+            # A promoted region's huge page was evicted, and comes back whole
+            self.__make_room(self.pages_per_region)
+            self.resident[key] = write
+            self.used += self.pages_per_region
+            self.huge_faults += 1
+            self.read_bytes[self.huge_size] += self.huge_size
+
+            if self.debug_mode:
+                print(f"huge page fault: region {region}")
+
+            return
+
+        faulted = self.faulted.setdefault(region, set())
+        faulted.add(page_number)
+
+        if self.can_promote and len(faulted) >= self.promotion_count:
+            self.__promote(region, write)
+            return
+
+        self.__make_room(1)
+        self.resident[page_number] = write
+        self.region_resident.setdefault(region, set()).add(page_number)
+        self.used += 1
+        self.small_faults += 1
+        self.read_bytes[self.small_size] += self.small_size
+
+        if self.debug_mode:
+            print(f"page fault: page {page_number}")
+
+    # Replaces the region's resident small pages with one huge page, reading in the rest of it
+    def __promote(self, region, write):
+        dirty = write
+        small_pages = self.region_resident.pop(region, set())
+
+        for page_number in small_pages:
+            dirty = self.resident.pop(page_number) or dirty
+
+        self.used -= len(small_pages)
+
+        self.__make_room(self.pages_per_region)
+        self.resident[-(region + 1)] = dirty
+        self.used += self.pages_per_region
+        self.promoted.add(region)
+        del self.faulted[region]
+
+        self.huge_faults += 1
+        self.promotions += 1
+        missing = self.pages_per_region - len(small_pages)
+        self.read_bytes[self.huge_size] += missing * self.small_size
+
+        if self.debug_mode:
+            print(f"promoted region {region} to a huge page")
+
+    # Evicts least recently used pages until `units` small pages of memory are free
+    def __make_room(self, units):
+        while self.used + units > self.capacity:
+            key, dirty = self.resident.popitem(last=False)
+
+            if key < 0:
+                self.used -= self.pages_per_region
+
+                if dirty:
+                    self.huge_writes += 1
+                    self.write_bytes[self.huge_size] += self.huge_size
+            else:
+                self.used -= 1
+                self.region_resident[key >> self.region_shift].discard(key)
+
+                if dirty:
+                    self.small_writes += 1
+                    self.write_bytes[self.small_size] += self.small_size
+
+    def get_total_disk_reads(self):
+        return self.small_faults + self.huge_faults
+
+    def get_total_disk_writes(self):
+        return self.small_writes + self.huge_writes
+
+    def get_total_page_faults(self):
+        return self.small_faults + self.huge_faults
+
+    # Faults and disk I/O of each page size, in the same form as replay_page_sizes()
+    def results(self, events):
+        results = []
+
+        for page_size, page_faults in (
+            (self.small_size, self.small_faults),
+            (self.huge_size, self.huge_faults),
+        ):
+            result = _size_result(page_size, None, events, page_faults, 0, 0)
+            result["read_bytes"] = self.read_bytes[page_size]
+            result["write_bytes"] = self.write_bytes[page_size]
+            results.append(result)
+
+        return results
+
+
+def print_results(results):
+    for result in results:
+        frames = "" if result["frames"] is None else f", {result['frames']} frames"
+        print(f"| {result['page_size']:>8} byte pages{frames}")
+        print(f"|   page faults: {result['page_faults']} ({result['fault_rate']:.4f}%)")
+        print(f"|   disk read: {result['read_bytes']:,} bytes")
+        print(f"|   disk written: {result['write_bytes']:,} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare page sizes on one decoded trace")
+    parser.add_argument("trace", help="trace file (plain, gzipped, binary or - for stdin)")
+    parser.add_argument("--memory", type=int, required=True, help="memory size in bytes")
+    parser.add_argument("--policy", choices=list(POLICIES), default="lru")
+    parser.add_argument(
+        "--page-sizes", nargs="+", type=int, default=DEFAULT_PAGE_SIZES, help="page sizes in bytes"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="seed for randomised policies")
+    parser.add_argument(
+        "--mixed", action="store_true", help="also run mixed 4K/2M pages with promotion (LRU)"
+    )
+    parser.add_argument(
+        "--promotion-threshold",
+        type=float,
+        default=DEFAULT_PROMOTION_THRESHOLD,
+        help=f"share of a 2M region's 4K pages that must fault before it's promoted "
+        f"(default: {DEFAULT_PROMOTION_THRESHOLD})",
+    )
+    args = parser.parse_args()
+
+    try:
+        for page_size in args.page_sizes:
+            page_offset_for(page_size)
+    except ValueError as error:
+        parser.error(str(error))
+
+    if not 0 < args.promotion_threshold <= 1:
+        parser.error("--promotion-threshold must be in (0, 1]")
+
+    smallest_page = min(args.page_sizes + ([SMALL_PAGE_SIZE] if args.mixed else []))
+
+    if args.memory < smallest_page:
+        parser.error(f"--memory must hold at least one {smallest_page}-byte page")
+
+    addresses, writes = load_addresses(args.trace)
+    print(f"events in trace: {len(addresses)}")
+    print(f"memory: {args.memory:,} bytes")
+
+    print(f"\n{args.policy} at each page size")
+    print_results(
+        replay_page_sizes(addresses, writes, args.page_sizes, args.policy, args.memory, args.seed)
+    )
+
+    if args.mixed:
+        mixed = MixedPageMMU(args.memory, args.promotion_threshold)
+        mixed.process_batch(addresses >> page_offset_for(SMALL_PAGE_SIZE), writes)
+
+        print(f"\nmixed 4K/2M pages, {mixed.promotions} promotions")
+        print_results(mixed.results(len(addresses)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+'''
+* Registry of the available replacement policies.
+* memsim.py, experiment.py and the replay engines look policies up here by
+* the name used on the command line.
+*
+'''
+from arcmmu import ArcMMU
+from clockmmu import ClockMMU
+from clockprommu import ClockProMMU
+from fastlrummu import FastLruMMU
+from lirsmmu import LirsMMU
+from lrummu import LruMMU
+from optmmu import DirtyOptMMU, OptMMU
+from randmmu import RandMMU
+from twoqmmu import TwoQMMU
+
+POLICIES = {
+    "rand": RandMMU,
+    "lru": LruMMU,
+    "fastlru": FastLruMMU,
+    "clock": ClockMMU,
+    # Scan-resistant policies
+    "arc": ArcMMU,
+    "2q": TwoQMMU,
+    "lirs": LirsMMU,
+    "clockpro": ClockProMMU,
+    # Offline lower bounds
+    "opt": OptMMU,
+    "opt-dirty": DirtyOptMMU,
+}
+
+# Policies whose results depend on a random seed
+SEEDED_POLICIES = {"rand"}
+
+# Policies that look ahead, so set_trace() must be given the whole trace before it's replayed
+OFFLINE_POLICIES = {"opt", "opt-dirty"}
+
+# Policies that can be timed by a disk model, see diskmodel.py
+DISK_POLICIES = {"lru", "clock"}
+
+
+def create_mmu(policy, frames, seed=None):
+    if policy not in POLICIES:
+        raise ValueError(f"Invalid replacement mode. Valid options are [{', '.join(POLICIES)}]")
+
+    if policy in SEEDED_POLICIES:
+        return POLICIES[policy](frames, seed)
+
+    return POLICIES[policy](frames)
@@ -1,14 +1,26 @@
-from mmu import MMU
-from random import randint
+import numpy as np
+
+from mmu import MMU, to_list
+
+RANDOM_BLOCK = 4096  # victim frames drawn from the generator at a time
 
 class RandMMU(MMU):
-    def __init__(self, frames):
+    # seed makes the victims reproducible - runs with the same seed evict the same frames
+    def __init__(self, frames, seed=None):
         self.frames = frames
         self.page_table = [None] * frames
         self.dirty_bits = [0] * frames
+        # Page number -> frame index for every resident page
+        self.page_frames = {}
 
-        # Pick random value for randmmu
-        self.random_value = randint(0,len(self.page_table)-1)
+        # Free frames are filled in order before any page is evicted
+        self.next_free_frame = 0
+
+        # Victims are pre-drawn in blocks, so a fault only has to take the next one
+        self.rng = np.random.default_rng(seed)
+        self.random_victims = []
+        self.next_victim = 0
+        self.random_value = 0
 
         self.disk_reads = 0
         self.disk_writes = 0
@@ -23,46 +35,50 @@ class RandMMU(MMU):
         self.debug_mode = False
 
     def read_memory(self, page_number):
-        page_index = 0
-
-        try:
-            # Check if the page is in the table and set use bit
-            page_index = self.page_table.index(page_number)
-    
-        except ValueError:
+        # Check if the page is in the table
+        if page_number not in self.page_frames:
             self.page_faults += 1
             self.__set_frame_to_replace()
             self.__write_if_dirty_page()
 
             # Read the page and perform operations
-            self.page_table[self.random_value] = page_number
+            self.__load_page(page_number)
             self.disk_reads += 1
-            self.__change_random_value()
 
 
     def write_memory(self, page_number):
-        page_index = 0
+        # Check if the page is in the table
+        page_index = self.page_frames.get(page_number)
 
-        try:
-            # Check if the page is in the table
-            page_index = self.page_table.index(page_number)
+        if page_index is not None:
             self.dirty_bits[page_index] = 1
-
-        except ValueError:
+        else:
             self.page_faults += 1
             self.__set_frame_to_replace()
             self.__write_if_dirty_page()
 
             # Read the page into the frame
-            self.page_table[self.random_value] = page_number
+            self.__load_page(page_number)
             
             # Perform operations
             self.disk_reads += 1
             self.dirty_bits[self.random_value] = 1
 
-            # Change the random value
-            self.__change_random_value()
 
+    def process_batch(self, pages, writes):
+        page_frames = self.page_frames
+        dirty_bits = self.dirty_bits
+
+        for page_number, write in zip(to_list(pages), to_list(writes)):
+            page_index = page_frames.get(page_number)
+
+            if page_index is None:
+                if write:
+                    self.write_memory(page_number)
+                else:
+                    self.read_memory(page_number)
+            elif write:
+                dirty_bits[page_index] = 1
 
     def get_total_disk_reads(self):
         return self.disk_reads
@@ -74,13 +90,31 @@ class RandMMU(MMU):
         return self.page_faults
     
     def __change_random_value(self):
-        # pick a new random value
-        self.random_value = randint(0,len(self.page_table)-1)        
+        # take the next pre-drawn victim, drawing a fresh block when they run out
+        if self.next_victim == len(self.random_victims):
+            self.random_victims = self.rng.integers(0, self.frames, RANDOM_BLOCK).tolist()
+            self.next_victim = 0
+
+        self.random_value = self.random_victims[self.next_victim]
+        self.next_victim += 1
 
     def __set_frame_to_replace(self):
-        # Change the random value until we find a free frame to replace
-        self.__change_random_value()
+        # Use a free frame while there is one, otherwise evict a random frame
+        if self.next_free_frame < self.frames:
+            self.random_value = self.next_free_frame
+            self.next_free_frame += 1
+        else:
+            self.__change_random_value()
         
+    def __load_page(self, page_number):
+        # Place the page in the selected frame, dropping the evicted page from the index
+        evicted = self.page_table[self.random_value]
+        if evicted is not None:
+            del self.page_frames[evicted]
+
+        self.page_table[self.random_value] = page_number
+        self.page_frames[page_number] = self.random_value
+
     def __write_if_dirty_page(self):
        # Write to the current random value selected
         if (self.dirty_bits[self.random_value] == 1):
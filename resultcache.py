@@ -0,0 +1,127 @@
+'''
+* Persistent cache of sweep results.
+* Every simulated point is appended to a JSON-lines file as soon as it is
+* computed, keyed by (trace content hash, policy, frame count, page size,
+* seed). A sweep that crashes, or is re-run with a finer grid, only has to
+* compute the points that aren't in the file yet.
+*
+* Runs of a randomised policy without a seed can't be reproduced, so they
+* are never cached.
+*
+'''
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from policies import SEEDED_POLICIES
+
+DEFAULT_CACHE_FP = "data/results_cache.jsonl"
+
+
+# Incremental hash of a decoded trace. Pages and write flags are hashed separately, so the
+# digest doesn't depend on how the trace was split into batches
+class TraceHasher:
+    def __init__(self):
+        self.pages = hashlib.sha256()
+        self.writes = hashlib.sha256()
+
+    def update(self, pages, writes):
+        self.pages.update(np.ascontiguousarray(pages, dtype="<u8").tobytes())
+        self.writes.update(np.ascontiguousarray(writes, dtype=np.bool_).tobytes())
+
+    def hexdigest(self):
+        combined = self.pages.hexdigest() + self.writes.hexdigest()
+
+        return hashlib.sha256(combined.encode()).hexdigest()
+
+
+# Hash of a decoded trace, so the same trace loaded from text or binary shares results
+def trace_digest(pages, writes):
+    hasher = TraceHasher()
+    hasher.update(pages, writes)
+
+    return hasher.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path=DEFAULT_CACHE_FP):
+        self.path = path
+        self.results = {}
+        self.file = None
+
+        if os.path.exists(path):
+            self.__load()
+
+    def __load(self):
+        with open(self.path, "r") as cache_file:
+            for line in cache_file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run killed mid-write can leave a partial last line
+                    continue
+
+                key = self.__key(
+                    record["trace"],
+                    record["policy"],
+                    record["frames"],
+                    record["page_size"],
+                    record["seed"],
+                )
+                self.results[key] = record["fault_rate"]
+
+    # Deterministic policies don't depend on the seed, so they're always stored without one
+    def __key(self, trace, policy, frames, page_size, seed):
+        if policy not in SEEDED_POLICIES:
+            seed = None
+
+        return (trace, policy, frames, page_size, seed)
+
+    def cacheable(self, policy, seed):
+        return policy not in SEEDED_POLICIES or seed is not None
+
+    # Returns the cached fault rate (%), or None if the point hasn't been computed
+    def get(self, trace, policy, frames, page_size, seed=None):
+        if not self.cacheable(policy, seed):
+            return None
+
+        return self.results.get(self.__key(trace, policy, frames, page_size, seed))
+
+    # Records a fault rate (%), appending it to the cache file straight away
+    def add(self, trace, policy, frames, page_size, seed, fault_rate):
+        if not self.cacheable(policy, seed):
+            return
+
+        key = self.__key(trace, policy, frames, page_size, seed)
+
+        if key in self.results:
+            return
+
+        self.results[key] = fault_rate
+
+        if self.file is None:
+            self.file = open(self.path, "a")
+
+        record = {
+            "trace": trace,
+            "policy": policy,
+            "frames": frames,
+            "page_size": page_size,
+            "seed": key[4],
+            "fault_rate": fault_rate,
+        }
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,258 @@
+'''
+* Sampled approximate LRU miss-ratio curves (SHARDS).
+* Pages are sampled spatially - a page is tracked only if a hash of its page
+* number falls below a threshold T, giving a sampling rate R = T / 2^24 - so
+* every access to a sampled page is seen and its reuse distance among the
+* sampled pages can be measured exactly. Each distance is scaled by 1 / R to
+* estimate the distance in the full trace, so the shortest distance that can
+* be told apart is 1 / R, and the curve isn't estimated below that many frames.
+*
+* Memory is bounded by max_samples rather than by the trace's footprint: when
+* more than max_samples pages are tracked, the threshold is lowered to the
+* largest tracked hash and those pages are dropped (fixed-size SHARDS). With
+* the rate unchanged all trace long, the SHARDS_adj correction is applied.
+*
+* Usage: python shards.py tracefile [tracefile ...] [--rate R] [--max-samples N]
+*                         [--page-size BYTES] [--exact]
+*
+* Writes data/<trace>_shards_data.json in the same shape as experiment.py's
+* data files, but under its own name so it never overwrites a full sweep's
+* data/<trace>_data.json - pass its path to graphing.plot_results() to plot
+* it. With --exact, the estimate is compared against the exact LRU curve
+* from stackdistance.py and the error is reported.
+*
+'''
+import argparse
+import bisect
+import heapq
+import json
+import math
+import os
+
+import numpy as np
+
+from stackdistance import StackDistanceAnalyzer
+from tracestream import DEFAULT_PAGE_SIZE, open_trace, page_offset_for, read_batches
+
+HASH_BITS = 24
+HASH_MODULUS = 1 << HASH_BITS
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)  # Fibonacci hashing constant, 2^64 / phi
+
+DEFAULT_RATE = 0.01
+DEFAULT_MAX_SAMPLES = 8192
+MAX_INCREMENTS = 1000  # frame counts in the estimated curve, as in experiment.py
+FRAME_TABLE_MULTIPLE = 1.2  # headroom over the estimated footprint, as it is only an estimate
+
+
+# Spreads page numbers uniformly over [0, HASH_MODULUS)
+def page_hashes(pages):
+    products = np.asarray(pages).astype(np.uint64) * HASH_MULTIPLIER
+
+    return products >> np.uint64(64 - HASH_BITS)
+
+
+class ShardsAnalyzer:
+    def __init__(self, rate=DEFAULT_RATE, max_samples=DEFAULT_MAX_SAMPLES):
+        self.threshold = max(1, int(rate * HASH_MODULUS))
+        self.initial_threshold = self.threshold
+        self.max_samples = max_samples
+
+        self.events = 0
+        self.sampled_events = 0
+
+        # Tracked pages: their last access time, and a max-heap of them on hash
+        self.last_access = {}
+        self.by_hash = []
+        # Last access times of the tracked pages, kept sorted
+        self.times = []
+
+        # Scaled reuse distance -> estimated number of references at that distance
+        self.histogram = {}
+        self.cold_weight = 0.0
+        self.total_weight = 0.0
+
+    def get_rate(self):
+        return self.threshold / HASH_MODULUS
+
+    def process_batch(self, pages, writes=None):
+        pages = np.asarray(pages)
+        hashes = page_hashes(pages)
+        sampled = np.flatnonzero(hashes < self.threshold)
+
+        for index, page, page_hash in zip(
+            sampled.tolist(), pages[sampled].tolist(), hashes[sampled].tolist()
+        ):
+            # The threshold may have dropped since the batch was filtered
+            if page_hash < self.threshold:
+                self.__access(self.events + index, page, page_hash)
+
+        self.events += len(pages)
+
+    def __access(self, time, page, page_hash):
+        weight = 1 / self.get_rate()
+        self.sampled_events += 1
+        self.total_weight += weight
+
+        previous = self.last_access.get(page)
+
+        if previous is None:
+            self.cold_weight += weight
+            heapq.heappush(self.by_hash, (-page_hash, page))
+        else:
+            # Distinct sampled pages touched since the last access, plus the page itself
+            position = bisect.bisect_left(self.times, previous)
+            distance = len(self.times) - position
+            del self.times[position]
+
+            # Each sampled page stands for 1 / R pages of the full trace
+            scaled = round(distance * weight)
+            self.histogram[scaled] = self.histogram.get(scaled, 0.0) + weight
+
+        self.last_access[page] = time
+        self.times.append(time)
+
+        if self.max_samples is not None and len(self.last_access) > self.max_samples:
+            self.__lower_threshold()
+
+    # Drops the pages with the largest hash, lowering the sampling rate to match
+    def __lower_threshold(self):
+        self.threshold = -self.by_hash[0][0]
+
+        while self.by_hash and -self.by_hash[0][0] >= self.threshold:
+            _, page = heapq.heappop(self.by_hash)
+            position = bisect.bisect_left(self.times, self.last_access.pop(page))
+            del self.times[position]
+
+    # Estimated footprint (unique pages) of the whole trace
+    def estimated_footprint(self):
+        return self.cold_weight
+
+    # Fewest frames the curve can be estimated at - a sampled distance of 1 scales to 1 / R
+    def min_frames(self):
+        return math.ceil(1 / self.get_rate())
+
+    # Estimated LRU page fault rate (%) at each frame count, or None for frame counts below
+    # min_frames(), which sampling can't resolve
+    def fault_curve(self, frame_counts):
+        histogram = dict(self.histogram)
+        total_weight = self.total_weight
+
+        # SHARDS_adj - correct for sampling more or fewer references than expected, crediting
+        # the difference to the shortest reuse distance. Only valid at a constant rate
+        if self.threshold == self.initial_threshold and self.events > 0:
+            rate = self.get_rate()
+            adjustment = (self.events * rate - self.sampled_events) / rate
+            histogram[0] = histogram.get(0, 0.0) + adjustment
+            total_weight += adjustment
+
+        min_frames = self.min_frames()
+
+        if total_weight <= 0:
+            return [0.0 if frames >= min_frames else None for frames in frame_counts]
+
+        distances = sorted(histogram)
+        weights = np.array([histogram[distance] for distance in distances])
+        # hits_within[i] is the weight of references with scaled distance <= distances[i]
+        hits_within = np.cumsum(weights)
+
+        curve = []
+
+        for frames in frame_counts:
+            if frames < min_frames:
+                curve.append(None)
+                continue
+
+            index = bisect.bisect_right(distances, frames)
+            hits = hits_within[index - 1] if index > 0 else 0.0
+            curve.append(max(0.0, 100 * (1 - hits / total_weight)))
+
+        return curve
+
+
+def trace_name(trace_fp):
+    name = os.path.basename(trace_fp)
+
+    return name.split(".")[0]
+
+
+def frame_grid(footprint):
+    max_table_size = max(1, math.ceil(footprint * FRAME_TABLE_MULTIPLE))
+    increment_size = math.ceil(max_table_size / MAX_INCREMENTS)
+
+    return list(range(increment_size, max_table_size + increment_size, increment_size))
+
+
+def exact_curve(trace_fp, page_offset, frame_counts):
+    with open_trace(trace_fp) as stream:
+        batches = list(read_batches(stream, page_offset))
+
+    pages = np.concatenate([pages for pages, _ in batches]).tolist()
+    writes = np.concatenate([writes for _, writes in batches]).tolist()
+
+    analyzer = StackDistanceAnalyzer()
+    analyzer.process(pages, writes)
+
+    return [analyzer.get_total_page_faults(frames) / len(pages) * 100 for frames in frame_counts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate LRU miss-ratio curves by sampling")
+    parser.add_argument("traces", nargs="+", help="trace files (plain, gzipped or - for stdin)")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="initial sampling rate")
+    parser.add_argument(
+        "--max-samples",
+        type=int,
+        default=DEFAULT_MAX_SAMPLES,
+        help="most pages tracked at once, 0 for no limit (fixed-rate sampling)",
+    )
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--exact", action="store_true", help="report error against exact LRU")
+    args = parser.parse_args()
+
+    if not 0 < args.rate <= 1:
+        parser.error("--rate must be in (0, 1]")
+
+    page_offset = page_offset_for(args.page_size)
+    max_samples = args.max_samples if args.max_samples > 0 else None
+
+    for trace_fp in args.traces:
+        name = trace_name(trace_fp)
+        print(f"\nsampling {name}...")
+
+        analyzer = ShardsAnalyzer(args.rate, max_samples)
+
+        with open_trace(trace_fp) as stream:
+            for pages, writes in read_batches(stream, page_offset):
+                analyzer.process_batch(pages, writes)
+
+        # The curve is clipped where sampling can no longer resolve it
+        frame_counts = frame_grid(analyzer.estimated_footprint())
+        frame_counts = [frames for frames in frame_counts if frames >= analyzer.min_frames()]
+        curve = analyzer.fault_curve(frame_counts)
+
+        print(f"| events: {analyzer.events}, sampled: {analyzer.sampled_events}")
+        print(f"| final sampling rate: {analyzer.get_rate():.5f}")
+        print(f"| estimated footprint: {analyzer.estimated_footprint():.0f} pages")
+        print(f"| smallest frame count estimated: {analyzer.min_frames()}")
+
+        if not frame_counts:
+            print("| the sampling rate is too low to estimate any point of the curve")
+            continue
+
+        if args.exact:
+            exact = exact_curve(trace_fp, page_offset, frame_counts)
+            errors = [abs(estimate - actual) for estimate, actual in zip(curve, exact)]
+            print(f"| mean absolute error: {sum(errors) / len(errors):.4f} percentage points")
+            print(f"| max absolute error: {max(errors):.4f} percentage points")
+
+        data = {name: {"increments": frame_counts, "lru": curve}}
+        data_fp = "data/" + name + "_shards_data.json"
+
+        with open(data_fp, "w") as f:
+            json.dump(data, f, indent=4)
+
+        print(f"-> saved {data_fp}")
+
+
+if __name__ == "__main__":
+    main()
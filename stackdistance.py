@@ -0,0 +1,144 @@
+'''
+* Single-pass LRU analysis using Mattson's stack algorithm.
+* LRU has the inclusion property - the pages resident with n frames are always
+* a subset of those resident with n + 1 frames - so the stack distance of each
+* access (its depth in the LRU stack) decides whether it hits for every frame
+* count at once. One pass over the trace gives the page faults and disk writes
+* LruMMU would report for any number of frames.
+*
+'''
+
+
+class FenwickTree:
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, index, value):
+        index += 1
+
+        while index <= self.size:
+            self.tree[index] += value
+            index += index & -index
+
+    # Sum of the values at positions [0, index)
+    def prefix_sum(self, index):
+        total = 0
+
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+
+        return total
+
+
+class StackDistanceAnalyzer:
+    def __init__(self):
+        self.events = 0
+        self.cold_misses = 0
+        self.unique_pages = 0
+
+        # distance_counts[d] is the number of re-references found at stack depth d
+        self.distance_counts = []
+        # write_deltas[f] is the change in disk writes going from f - 1 to f frames
+        self.write_deltas = []
+
+        self.page_faults = []
+        self.disk_writes = []
+
+    # Runs the whole trace through the LRU stack. pages and writes are parallel sequences,
+    # writes[i] being true when access i is a write
+    def process(self, pages, writes):
+        events = len(pages)
+        times = FenwickTree(events)
+
+        # Most recent access time of each page, marked in the tree while it's the latest
+        last_access = {}
+        # Smallest frame count at which the page's current residency has been written to
+        write_thresholds = {}
+
+        distance_counts = [0] * (events + 2)
+        write_deltas = [0] * (events + 2)
+        cold_misses = 0
+
+        for time in range(events):
+            page = pages[time]
+            previous = last_access.get(page)
+
+            if previous is None:
+                cold_misses += 1
+                threshold = float("inf")
+            else:
+                # Depth in the stack = distinct pages touched since the last access, plus itself
+                distance = times.prefix_sum(time) - times.prefix_sum(previous + 1) + 1
+                distance_counts[distance] += 1
+                times.add(previous, -1)
+
+                # With fewer than `distance` frames the page was evicted before this access,
+                # costing a disk write if it had been written during that residency
+                threshold = write_thresholds[page]
+                self.__add_write_range(write_deltas, threshold, distance)
+                threshold = max(threshold, distance)
+
+            if writes[time]:
+                threshold = 0
+
+            write_thresholds[page] = threshold
+            last_access[page] = time
+            times.add(time, 1)
+
+        # Pages still resident at the end are never written back, so only those pushed
+        # deeper than the frame count by later accesses count as evicted
+        final_order = sorted(last_access.items(), key=lambda item: item[1], reverse=True)
+
+        for depth, (page, _) in enumerate(final_order, start=1):
+            self.__add_write_range(write_deltas, write_thresholds[page], depth)
+
+        self.events = events
+        self.cold_misses = cold_misses
+        self.unique_pages = len(last_access)
+        self.distance_counts = distance_counts[: self.unique_pages + 2]
+        self.write_deltas = write_deltas[: self.unique_pages + 2]
+
+        self.__build_curves()
+
+    # Records a disk write for every frame count in [threshold, distance - 1]
+    def __add_write_range(self, write_deltas, threshold, distance):
+        start = max(threshold, 1)
+
+        if start < distance:
+            write_deltas[start] += 1
+            write_deltas[distance] -= 1
+
+    def __build_curves(self):
+        # page_faults[f] / disk_writes[f] are the LruMMU totals with f frames, for
+        # f in [0, unique_pages] - any larger frame count matches unique_pages
+        self.page_faults = [self.events]
+        self.disk_writes = [0]
+
+        faults = self.events
+        writes = 0
+
+        for frames in range(1, self.unique_pages + 1):
+            faults -= self.distance_counts[frames]
+            writes += self.write_deltas[frames]
+            self.page_faults.append(faults)
+            self.disk_writes.append(writes)
+
+    def __clamp(self, frames):
+        return min(frames, self.unique_pages)
+
+    def get_total_page_faults(self, frames):
+        return self.page_faults[self.__clamp(frames)]
+
+    def get_total_disk_reads(self, frames):
+        return self.page_faults[self.__clamp(frames)]
+
+    def get_total_disk_writes(self, frames):
+        return self.disk_writes[self.__clamp(frames)]
+
+    def fault_curve(self, frame_counts):
+        return [self.get_total_page_faults(frames) for frames in frame_counts]
+
+    def write_curve(self, frame_counts):
+        return [self.get_total_disk_writes(frames) for frames in frame_counts]
@@ -0,0 +1,94 @@
+'''
+* Frame-count sweep runner.
+* A sweep is split into (trace, policies, frame_counts, seed) jobs. Each job
+* runs one fused replay (see fusedreplay.py) driving every policy at every one
+* of its frame counts, and is independent of every other job, so a sweep can be
+* split across a process pool. Workers are forked after the decoded traces
+* are stored in a module-level table, so they inherit the arrays instead of
+* having them pickled for every job.
+*
+* Randomised policies can be run under several seeds, each seed being its own
+* job, and average_results combines them into a mean fault rate.
+*
+'''
+import multiprocessing
+
+from fusedreplay import FusedReplay
+from policies import SEEDED_POLICIES
+
+FRAME_COUNTS_PER_JOB = 8  # frame counts fused into a single pass over the trace
+
+# Decoded traces, keyed by trace name, visible to forked workers
+_shared_traces = {}
+
+
+# Replays a trace through every policy at every frame count in one fused pass, returning
+# the page fault rate (%) of each as {(policy, frame_count): rate}
+def replay(pages, writes, policies, frame_counts, seed=None, instruments=None):
+    fused = FusedReplay(policies, frame_counts, seed, instruments=instruments)
+    fused.run(pages, writes)
+
+    return {
+        (policy, frames): fused.fault_rate(policy, frames)
+        for policy in policies
+        for frames in frame_counts
+    }
+
+
+# Splits a sweep of one trace into jobs of up to per_job frame counts each. Every policy
+# runs under the first seed, and randomised policies are repeated under the rest
+def make_jobs(name, policies, frame_counts, seeds=(None,), per_job=FRAME_COUNTS_PER_JOB):
+    frame_counts = list(frame_counts)
+    seeded = tuple(policy for policy in policies if policy in SEEDED_POLICIES)
+    jobs = []
+
+    for start in range(0, len(frame_counts), per_job):
+        chunk = tuple(frame_counts[start : start + per_job])
+        jobs.append((name, tuple(policies), chunk, seeds[0]))
+
+        if seeded:
+            jobs.extend((name, seeded, chunk, seed) for seed in seeds[1:])
+
+    return jobs
+
+
+# Averages the fault rates of every job, returning {(policy, frame_count): mean rate}
+def average_results(results):
+    totals = {}
+
+    for fault_rates in results:
+        for key, fault_rate in fault_rates.items():
+            total, count = totals.get(key, (0.0, 0))
+            totals[key] = (total + fault_rate, count + 1)
+
+    return {key: total / count for key, (total, count) in totals.items()}
+
+
+def _run_job(job):
+    name, policies, frame_counts, seed = job
+    pages, writes = _shared_traces[name]
+
+    return replay(pages, writes, policies, frame_counts, seed)
+
+
+# Yields the result of each (trace name, policies, frame_counts, seed) job, in job order.
+# traces_by_name maps each trace name to its (pages, writes) arrays. instruments, if given,
+# only sees serial sweeps, as workers' MMUs live in other processes
+def run_sweep(traces_by_name, jobs, workers=1, instruments=None):
+    if workers <= 1:
+        for name, policies, frame_counts, seed in jobs:
+            pages, writes = traces_by_name[name]
+            yield replay(pages, writes, policies, frame_counts, seed, instruments)
+
+        return
+
+    _shared_traces.update(traces_by_name)
+
+    try:
+        context = multiprocessing.get_context("fork")
+
+        with context.Pool(workers) as pool:
+            for result in pool.imap(_run_job, jobs):
+                yield result
+    finally:
+        _shared_traces.clear()
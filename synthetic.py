@@ -0,0 +1,59 @@
+'''
+* Synthetic trace generators.
+* Each generator returns (pages, writes) arrays in the same form as
+* tracestream.load_pages, so they can be fed straight to MMU.process_batch,
+* the kernels or the stack-distance analyzer.
+*
+*   uniform - every page equally likely
+*   zipf    - page i drawn with probability proportional to 1 / i^alpha
+*   looping - pages 0..loop_pages-1 accessed in order, over and over
+*
+'''
+import numpy as np
+
+GENERATORS = ("uniform", "zipf", "looping")
+
+
+def _writes(rng, size, write_ratio):
+    return rng.random(size) < write_ratio
+
+
+def uniform_trace(size, unique_pages, write_ratio=0.2, seed=0):
+    rng = np.random.default_rng(seed)
+    pages = rng.integers(0, unique_pages, size=size, dtype=np.uint32)
+
+    return pages, _writes(rng, size, write_ratio)
+
+
+def zipf_trace(size, unique_pages, alpha=1.0, write_ratio=0.2, seed=0):
+    rng = np.random.default_rng(seed)
+
+    # Sample ranks from the bounded Zipf distribution through its CDF
+    weights = 1.0 / np.arange(1, unique_pages + 1) ** alpha
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    ranks = np.searchsorted(cdf, rng.random(size), side="right")
+    ranks = np.minimum(ranks, unique_pages - 1)
+
+    # Shuffle which page gets which rank so hot pages aren't all adjacent
+    pages = rng.permutation(unique_pages).astype(np.uint32)[ranks]
+
+    return pages, _writes(rng, size, write_ratio)
+
+
+def looping_trace(size, loop_pages, write_ratio=0.2, seed=0):
+    rng = np.random.default_rng(seed)
+    pages = (np.arange(size) % loop_pages).astype(np.uint32)
+
+    return pages, _writes(rng, size, write_ratio)
+
+
+def generate(kind, size, unique_pages, write_ratio=0.2, seed=0):
+    if kind == "uniform":
+        return uniform_trace(size, unique_pages, write_ratio, seed)
+    elif kind == "zipf":
+        return zipf_trace(size, unique_pages, write_ratio=write_ratio, seed=seed)
+    elif kind == "looping":
+        return looping_trace(size, unique_pages, write_ratio, seed)
+
+    raise ValueError(f"Unknown synthetic trace '{kind}'. Valid options are {list(GENERATORS)}")
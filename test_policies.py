@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from kernels import verify_equivalence
+from policies import OFFLINE_POLICIES, POLICIES, create_mmu
+
+FRAME_COUNTS = (1, 3, 16, 64)
+SEED = 7
+
+
+# Accesses mostly to a small hot set, the rest spread over a wider range, about 30% writes
+def random_trace(seed, length=5000, hot_pages=40, cold_pages=400):
+    rng = np.random.default_rng(seed)
+    hot = rng.random(length) < 0.8
+    pages = np.where(
+        hot, rng.integers(hot_pages, size=length), rng.integers(cold_pages, size=length)
+    )
+    writes = rng.random(length) < 0.3
+
+    return pages.astype(np.int64), writes
+
+
+def make_mmu(policy, frames, pages):
+    mmu = create_mmu(policy, frames, SEED)
+
+    if policy in OFFLINE_POLICIES:
+        mmu.set_trace(pages)
+
+    return mmu
+
+
+def totals(mmu):
+    return mmu.get_total_disk_reads(), mmu.get_total_disk_writes(), mmu.get_total_page_faults()
+
+
+def replay(policy, frames, pages, writes):
+    mmu = make_mmu(policy, frames, pages)
+    mmu.process_batch(pages, writes)
+
+    return mmu
+
+
+@pytest.mark.parametrize("frames", FRAME_COUNTS)
+@pytest.mark.parametrize("policy", list(POLICIES))
+def test_batches_match_per_access_replay(policy, frames):
+    pages, writes = random_trace(frames)
+
+    per_access = make_mmu(policy, frames, pages)
+
+    for page_number, write in zip(pages.tolist(), writes.tolist()):
+        if write:
+            per_access.write_memory(page_number)
+        else:
+            per_access.read_memory(page_number)
+
+    # Uneven batches, so some of them split a run of hits or misses
+    batched = make_mmu(policy, frames, pages)
+
+    for start, end in ((0, 1), (1, 1000), (1000, 1001), (1001, len(pages))):
+        batched.process_batch(pages[start:end], writes[start:end])
+
+    assert totals(batched) == totals(per_access)
+
+
+@pytest.mark.parametrize("frames", FRAME_COUNTS)
+@pytest.mark.parametrize("policy", list(POLICIES))
+def test_no_policy_beats_opt(policy, frames):
+    pages, writes = random_trace(100 + frames)
+
+    opt_faults = replay("opt", frames, pages, writes).get_total_page_faults()
+
+    assert replay(policy, frames, pages, writes).get_total_page_faults() >= opt_faults
+
+
+def test_kernels_match_mmus():
+    pages, writes = random_trace(0, length=2000)
+
+    verify_equivalence(pages, writes)
+
+
+# A loop slightly larger than memory flushes LRU on every pass, while a scan-resistant policy
+# keeps most of the loop resident
+def test_clockpro_keeps_most_of_a_loop_larger_than_memory():
+    pages = np.tile(np.arange(120), 100)
+    writes = np.zeros(len(pages), dtype=np.bool_)
+
+    lru_faults = replay("lru", 100, pages, writes).get_total_page_faults()
+    lirs_faults = replay("lirs", 100, pages, writes).get_total_page_faults()
+    clockpro_faults = replay("clockpro", 100, pages, writes).get_total_page_faults()
+
+    assert lru_faults == len(pages)
+    assert clockpro_faults <= 3 * lirs_faults
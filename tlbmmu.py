@@ -0,0 +1,226 @@
+'''
+* Address translation cost model.
+* TlbMMU sits in front of any MMU and models what each access costs before
+* the page is even looked up: a set-associative L1 TLB, a larger L2 TLB, and
+* on a miss in both, a walk of a radix page table. Upper levels of the walk
+* can hit in a page-walk cache; the rest each cost a memory reference.
+*
+* Every access is handed on to the wrapped MMU, which still decides page
+* faults and write-backs, and the effective access time is estimated as
+*   (translation time + memory time per access + fault and write-back time)
+*   / accesses
+* using the latencies in TLB_DEFAULTS, any of which can be overridden.
+*
+* TLB entries aren't shot down when the wrapped MMU evicts a page, so an
+* access that faults may still be counted as a TLB hit. Its fault is costed
+* in full either way.
+*
+'''
+from collections import OrderedDict
+
+from mmu import MMU, to_list
+
+TLB_DEFAULTS = {
+    # Geometry
+    "l1_entries": 64,
+    "l1_ways": 4,
+    "l2_entries": 1536,
+    "l2_ways": 12,
+    "levels": 4,  # radix page table levels, 4 as on x86-64
+    "bits_per_level": 9,
+    "walk_cache_entries": 32,  # cached entries per upper page-table level, 0 for none
+    # Latencies, in nanoseconds
+    "l1_ns": 1.0,
+    "l2_ns": 5.0,
+    "walk_cache_ns": 2.0,
+    "walk_memory_ns": 60.0,  # one page-table entry read on a walk
+    "memory_ns": 60.0,  # the access itself, once translated
+    "page_fault_ns": 100000.0,  # reading a page in from disk
+    "disk_write_ns": 100000.0,  # writing a dirty page back
+}
+
+
+class SetAssociativeTLB:
+    def __init__(self, entries, ways):
+        self.ways = ways
+        self.set_count = max(1, entries // ways)
+        # Each set maps its pages in least to most recently used order
+        self.sets = [OrderedDict() for _ in range(self.set_count)]
+
+    # Returns whether the page hit, making it the most recently used of its set
+    def lookup(self, page_number):
+        tlb_set = self.sets[page_number % self.set_count]
+
+        if page_number in tlb_set:
+            tlb_set.move_to_end(page_number)
+            return True
+
+        return False
+
+    def insert(self, page_number):
+        tlb_set = self.sets[page_number % self.set_count]
+        tlb_set[page_number] = None
+
+        if len(tlb_set) > self.ways:
+            tlb_set.popitem(last=False)
+
+
+class TlbMMU(MMU):
+    # mmu is the wrapped MMU, and config overrides any of TLB_DEFAULTS
+    def __init__(self, mmu, **config):
+        unknown = set(config) - set(TLB_DEFAULTS)
+
+        if unknown:
+            raise ValueError(f"Unknown TLB settings: {', '.join(sorted(unknown))}")
+
+        self.mmu = mmu
+        self.config = {**TLB_DEFAULTS, **config}
+
+        self.l1 = SetAssociativeTLB(self.config["l1_entries"], self.config["l1_ways"])
+        self.l2 = SetAssociativeTLB(self.config["l2_entries"], self.config["l2_ways"])
+
+        # One LRU cache of page-table entries per upper level, root first
+        self.walk_caches = [OrderedDict() for _ in range(self.config["levels"] - 1)]
+
+        # The last page translated, which needs no lookup at all if it's used again
+        self.last_page = None
+
+        self.accesses = 0
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.walks = 0
+        self.walk_references = 0
+        self.walk_cache_hits = 0
+
+    def set_debug(self):
+        self.mmu.set_debug()
+
+    def reset_debug(self):
+        self.mmu.reset_debug()
+
+    def set_instruments(self, instruments):
+        self.mmu.set_instruments(instruments)
+
+    # For offline policies, see policies.OFFLINE_POLICIES
+    def set_trace(self, pages, next_use=None):
+        self.mmu.set_trace(pages, next_use)
+
+    def read_memory(self, page_number):
+        self.__translate(page_number)
+        self.mmu.read_memory(page_number)
+
+    def write_memory(self, page_number):
+        self.__translate(page_number)
+        self.mmu.write_memory(page_number)
+
+    def process_batch(self, pages, writes):
+        pages = to_list(pages)
+        last_page = self.last_page
+        repeats = 0
+
+        for page_number in pages:
+            # Fast check - the same page again is an L1 hit that leaves the TLB as it is
+            if page_number == last_page:
+                repeats += 1
+                continue
+
+            last_page = page_number
+            self.__look_up(page_number)
+
+        self.accesses += len(pages)
+        self.l1_hits += repeats
+        self.last_page = last_page
+
+        self.mmu.process_batch(pages, writes)
+
+    def __translate(self, page_number):
+        self.accesses += 1
+
+        if page_number == self.last_page:
+            self.l1_hits += 1
+            return
+
+        self.last_page = page_number
+        self.__look_up(page_number)
+
+    # Looks the page up in the L1 and L2 TLBs, walking the page table if both miss
+    def __look_up(self, page_number):
+        if self.l1.lookup(page_number):
+            self.l1_hits += 1
+        elif self.l2.lookup(page_number):
+            self.l2_hits += 1
+            self.l1.insert(page_number)
+        else:
+            self.__walk(page_number)
+            self.l2.insert(page_number)
+            self.l1.insert(page_number)
+
+    # Walks the page table from the deepest level whose entry is in the page-walk cache
+    def __walk(self, page_number):
+        self.walks += 1
+
+        levels = self.config["levels"]
+        bits = self.config["bits_per_level"]
+        limit = self.config["walk_cache_entries"]
+        # The first level still to be read from memory
+        start = 0
+
+        for level in range(levels - 2, -1, -1):
+            if (page_number >> (bits * (levels - 1 - level))) in self.walk_caches[level]:
+                start = level + 1
+                self.walk_cache_hits += 1
+                break
+
+        self.walk_references += levels - start
+
+        if limit <= 0:
+            return
+
+        # Every upper-level entry read, or found, on the way down is now the most recent
+        for level in range(levels - 1):
+            cache = self.walk_caches[level]
+            key = page_number >> (bits * (levels - 1 - level))
+            cache[key] = None
+            cache.move_to_end(key)
+
+            if len(cache) > limit:
+                cache.popitem(last=False)
+
+    # Total time spent translating addresses, in nanoseconds
+    def translation_time(self):
+        config = self.config
+        l1_misses = self.accesses - self.l1_hits
+
+        return (
+            self.accesses * config["l1_ns"]
+            + l1_misses * config["l2_ns"]
+            + self.walks * (config["walk_cache_ns"] if config["walk_cache_entries"] > 0 else 0)
+            + self.walk_references * config["walk_memory_ns"]
+        )
+
+    # Estimated mean time per access, in nanoseconds, including page faults and write-backs
+    def effective_access_time(self):
+        if self.accesses == 0:
+            return 0.0
+
+        config = self.config
+        total = (
+            self.translation_time()
+            + self.accesses * config["memory_ns"]
+            + self.mmu.get_total_page_faults() * config["page_fault_ns"]
+            + self.mmu.get_total_disk_writes() * config["disk_write_ns"]
+        )
+
+        return total / self.accesses
+
+    def get_total_tlb_misses(self):
+        return self.walks
+
+    def get_total_disk_reads(self):
+        return self.mmu.get_total_disk_reads()
+
+    def get_total_disk_writes(self):
+        return self.mmu.get_total_disk_writes()
+
+    def get_total_page_faults(self):
+        return self.mmu.get_total_page_faults()
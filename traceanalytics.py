@@ -0,0 +1,367 @@
+'''
+* Trace analytics.
+* A single streaming pass over a trace, batch by batch, measures:
+*   - footprint: the number of distinct pages touched
+*   - the read/write mix
+*   - the reuse distance distribution - distinct pages touched since the
+*     page was last used, its LRU stack depth - bucketed by powers of two,
+*     alongside the reuse time, in accesses, bucketed the same way. Distances
+*     come from a Fenwick tree over access slots, as in stackdistance.py,
+*     compacted whenever its slots run out so the pass can stream
+*   - the LRU knee: the fewest frames that leave capacity misses below
+*     KNEE_FRACTION of the accesses
+*   - Denning's mean working-set size s(T) for several window lengths T -
+*     the average, over every access, of the distinct pages among the last T
+*     accesses. A reference keeps its page in the windows ending at it and
+*     the T - 1 accesses after, or until the page's next reference, so s(T)
+*     is the sum over references of min(reuse time, T), with a first
+*     reference counting as T, less the windows that would end past the
+*     trace's last access, over the number of accesses. It's exact
+*   - phases: the trace is cut into fixed windows, and a new phase starts
+*     whenever a window's page set overlaps the previous window's by less
+*     than PHASE_SIMILARITY (Jaccard similarity)
+*
+* Sweeps are sized from the knee and the largest working set by frame_limit().
+*
+* Profiles are cached as data/<trace>_analytics.json, tagged with the
+* trace's content hash and page size, and recomputed when either changes.
+*
+* Usage: python traceanalytics.py tracefile [tracefile ...] [--page-size BYTES]
+*
+'''
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+
+from resultcache import TraceHasher
+from stackdistance import FenwickTree
+from tracestream import DEFAULT_PAGE_SIZE, open_trace, page_offset_for, read_batches
+
+WORKING_SET_WINDOWS = (100, 1000, 10000, 100000)  # window lengths T, in accesses
+PHASE_WINDOW = 10000  # accesses per window when looking for phase changes
+PHASE_SIMILARITY = 0.5  # Jaccard similarity below which consecutive windows are different phases
+KNEE_FRACTION = 0.001  # share of accesses left as capacity misses at the LRU knee
+MIN_SLOTS = 1 << 16  # smallest Fenwick tree used for reuse distances
+PROFILE_VERSION = 3  # bumped when profiles gain fields, so older cached ones are recomputed
+
+
+class TraceAnalyzer:
+    def __init__(
+        self,
+        windows=WORKING_SET_WINDOWS,
+        phase_window=PHASE_WINDOW,
+        phase_similarity=PHASE_SIMILARITY,
+    ):
+        self.windows = list(windows)
+        self.phase_window = phase_window
+        self.phase_similarity = phase_similarity
+
+        self.events = 0
+        self.writes = 0
+        self.hasher = TraceHasher()
+
+        # Time of the most recent access to every page seen so far
+        self.last_access = {}
+
+        # reuse_buckets[k] counts reuses after between 2^k and 2^(k+1) - 1 accesses
+        self.reuse_buckets = []
+        # distance_counts[d] counts reuses at LRU stack depth d
+        self.distance_counts = np.zeros(0, dtype=np.int64)
+
+        # Each page's latest access holds a slot, marked in the tree; slots are handed out in
+        # access order, so the marked slots after a page's own are the pages touched since
+        self.slots = FenwickTree(MIN_SLOTS)
+        self.page_slots = {}
+        self.next_slot = 0
+        self.cold_references = 0
+        # Sum over references of min(reuse time, T), for each working-set window T, with a first
+        # reference counting as T
+        self.window_sums = [0] * len(self.windows)
+
+        # Accesses of the current, incomplete phase window
+        self.window_pages = np.zeros(0, dtype=np.int64)
+        self.previous_window = None
+        self.window_sizes = []
+        self.phase_starts = [0]
+
+    def process_batch(self, pages, writes):
+        pages = np.asarray(pages).astype(np.int64)
+        writes = np.asarray(writes, dtype=np.bool_)
+
+        self.hasher.update(pages, writes)
+        self.writes += int(np.count_nonzero(writes))
+        self.__record_reuse(pages)
+        self.__record_distances(pages.tolist())
+        self.__record_phases(pages)
+
+        self.events += len(pages)
+
+    def __record_reuse(self, pages):
+        count = len(pages)
+
+        if count == 0:
+            return
+
+        times = np.arange(self.events, self.events + count, dtype=np.int64)
+
+        # Group each page's accesses together, in time order, to find reuses inside the batch
+        order = np.argsort(pages, kind="stable")
+        sorted_pages = pages[order]
+        group_start = np.ones(count, dtype=np.bool_)
+        group_start[1:] = sorted_pages[1:] != sorted_pages[:-1]
+
+        previous = np.full(count, -1, dtype=np.int64)
+        repeats = np.flatnonzero(~group_start)
+        previous[order[repeats]] = times[order[repeats - 1]]
+
+        # The first access to each page in the batch may reuse a page from an earlier batch
+        firsts = order[group_start]
+        last_access = self.last_access
+
+        for index, page in zip(firsts.tolist(), pages[firsts].tolist()):
+            previous[index] = last_access.get(page, -1)
+
+        group_end = np.ones(count, dtype=np.bool_)
+        group_end[:-1] = group_start[1:]
+        lasts = order[group_end]
+        last_access.update(zip(pages[lasts].tolist(), times[lasts].tolist()))
+
+        cold = previous < 0
+        reuse = (times - previous)[~cold]
+        self.cold_references += int(np.count_nonzero(cold))
+
+        _add_log2_buckets(self.reuse_buckets, reuse)
+
+        # A first reference has no earlier one to cut its windows short
+        cold_count = int(np.count_nonzero(cold))
+
+        for i, window in enumerate(self.windows):
+            self.window_sums[i] += int(np.minimum(reuse, window).sum()) + cold_count * window
+
+    def __record_distances(self, pages):
+        slots = self.slots
+        page_slots = self.page_slots
+        distances = []
+
+        for page in pages:
+            if self.next_slot == slots.size:
+                self.__compact_slots()
+                slots = self.slots
+                page_slots = self.page_slots
+
+            previous = page_slots.get(page)
+
+            if previous is not None:
+                # Depth in the stack = distinct pages touched since the last access, plus itself
+                distances.append(len(page_slots) - slots.prefix_sum(previous + 1) + 1)
+                slots.add(previous, -1)
+
+            page_slots[page] = self.next_slot
+            slots.add(self.next_slot, 1)
+            self.next_slot += 1
+
+        if not distances:
+            return
+
+        counts = np.bincount(distances)
+
+        if len(counts) > len(self.distance_counts):
+            grown = np.zeros(len(counts), dtype=np.int64)
+            grown[: len(self.distance_counts)] = self.distance_counts
+            self.distance_counts = grown
+
+        self.distance_counts[: len(counts)] += counts
+
+    # Renumbers the marked slots from 0, in access order, into a tree with room to spare
+    def __compact_slots(self):
+        order = sorted(self.page_slots, key=self.page_slots.get)
+        self.slots = FenwickTree(max(MIN_SLOTS, 2 * len(order)))
+        self.page_slots = {}
+
+        for slot, page in enumerate(order):
+            self.page_slots[page] = slot
+            self.slots.add(slot, 1)
+
+        self.next_slot = len(order)
+
+    # Fewest frames at which LRU's capacity misses are at most KNEE_FRACTION of the accesses
+    def lru_knee(self):
+        # Reuses at depth d miss with fewer than d frames
+        misses = self.distance_counts[::-1].cumsum()[::-1]
+        allowed = KNEE_FRACTION * self.events
+        within = np.flatnonzero(misses <= allowed)
+
+        # misses[d] are the capacity misses with d - 1 frames
+        return max(1, int(within[0]) - 1) if len(within) else max(1, len(self.distance_counts) - 1)
+
+    def __record_phases(self, pages):
+        window_pages = np.concatenate([self.window_pages, pages])
+        complete = len(window_pages) // self.phase_window
+
+        for i in range(complete):
+            start = i * self.phase_window
+            self.__close_window(window_pages[start : start + self.phase_window])
+
+        self.window_pages = window_pages[complete * self.phase_window :]
+
+    def __close_window(self, pages):
+        page_set = np.unique(pages)
+        self.window_sizes.append(len(page_set))
+
+        if self.previous_window is not None:
+            shared = len(np.intersect1d(page_set, self.previous_window, assume_unique=True))
+            similarity = shared / (len(page_set) + len(self.previous_window) - shared)
+
+            if similarity < self.phase_similarity:
+                self.phase_starts.append((len(self.window_sizes) - 1) * self.phase_window)
+
+        self.previous_window = page_set
+
+    def footprint(self):
+        return len(self.last_access)
+
+    # Mean working-set size over every window of `window` accesses
+    def working_set_size(self, window):
+        if not self.events:
+            return 0.0
+
+        # Each page's last reference was counted in windows up to window - 1 accesses after it,
+        # some of which would end past the last access
+        last_times = np.fromiter(self.last_access.values(), dtype=np.int64)
+        overrun = np.maximum(last_times + window - self.events, 0).sum()
+
+        return (self.window_sums[self.windows.index(window)] - int(overrun)) / self.events
+
+    def profile(self, page_size=DEFAULT_PAGE_SIZE):
+        return {
+            "version": PROFILE_VERSION,
+            "digest": self.hasher.hexdigest(),
+            "page_size": page_size,
+            "events": self.events,
+            "footprint": self.footprint(),
+            "writes": self.writes,
+            "write_ratio": self.writes / self.events if self.events else 0.0,
+            "cold_references": self.cold_references,
+            "reuse_time_log2_buckets": list(self.reuse_buckets),
+            "reuse_distance_log2_buckets": self.__distance_buckets(),
+            "lru_knee": self.lru_knee(),
+            "working_set": {str(window): self.working_set_size(window) for window in self.windows},
+            "phase_window": self.phase_window,
+            "window_working_sets": list(self.window_sizes),
+            "phase_starts": list(self.phase_starts),
+        }
+
+    def __distance_buckets(self):
+        buckets = []
+        depths = np.flatnonzero(self.distance_counts)
+        _add_log2_buckets(buckets, depths, self.distance_counts[depths])
+
+        return buckets
+
+
+# Adds each value, weighted by its count (1 if not given), to buckets[floor(log2(value))]
+def _add_log2_buckets(buckets, values, counts=None):
+    if len(values) == 0:
+        return
+
+    totals = np.bincount(np.log2(values).astype(np.int64), weights=counts)
+
+    if len(totals) > len(buckets):
+        buckets.extend([0] * (len(totals) - len(buckets)))
+
+    for bucket, occurrences in enumerate(totals):
+        buckets[bucket] += int(occurrences)
+
+
+def profile_path(name):
+    return "data/" + name + "_analytics.json"
+
+
+# The cached profile of a trace, or None if it's missing or was made from other content
+def load_profile(name, digest, page_size):
+    path = profile_path(name)
+
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r") as f:
+        profile = json.load(f)
+
+    if profile.get("version") != PROFILE_VERSION:
+        return None
+
+    if profile.get("digest") != digest or profile.get("page_size") != page_size:
+        return None
+
+    return profile
+
+
+def save_profile(name, profile):
+    with open(profile_path(name), "w") as f:
+        json.dump(profile, f, indent=4)
+
+
+# Profile of a decoded trace, read from the cache when its content hasn't changed
+def trace_profile(name, pages, writes, digest, page_size=DEFAULT_PAGE_SIZE):
+    profile = load_profile(name, digest, page_size)
+
+    if profile is None:
+        analyzer = TraceAnalyzer()
+        analyzer.process_batch(pages, writes)
+        profile = analyzer.profile(page_size)
+        save_profile(name, profile)
+
+    return profile
+
+
+# Largest frame count worth sweeping - far enough to take in both the LRU knee, past which
+# extra frames barely help, and the largest mean working set, but never past the footprint,
+# where every page is resident, no policy evicts and more frames change nothing
+def frame_limit(profile):
+    largest_working_set = max(profile["working_set"].values(), default=0)
+    limit = max(profile["lru_knee"], math.ceil(largest_working_set))
+
+    return max(1, min(profile["footprint"], limit))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile traces in a single streaming pass")
+    parser.add_argument("traces", nargs="+", help="trace files (plain, gzipped or - for stdin)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    args = parser.parse_args()
+
+    try:
+        page_offset = page_offset_for(args.page_size)
+    except ValueError as error:
+        parser.error(str(error))
+
+    for trace_fp in args.traces:
+        name = os.path.basename(trace_fp).split(".")[0]
+        print(f"\nprofiling {name}...")
+
+        analyzer = TraceAnalyzer()
+
+        with open_trace(trace_fp) as stream:
+            for pages, writes in read_batches(stream, page_offset):
+                analyzer.process_batch(pages, writes)
+
+        profile = analyzer.profile(args.page_size)
+        save_profile(name, profile)
+
+        print(f"| events: {profile['events']}, footprint: {profile['footprint']} pages")
+        print(f"| write ratio: {profile['write_ratio']:.4f}")
+
+        for window, size in profile["working_set"].items():
+            print(f"| mean working set over {window} accesses: {size:.1f} pages")
+
+        print(f"| lru knee: {profile['lru_knee']} frames, sweep limit: {frame_limit(profile)}")
+
+        print(f"| phases: {len(profile['phase_starts'])}")
+        print(f"-> saved {profile_path(name)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+'''
+* Streaming trace input.
+* Traces are read through a pipeline of generators - raw chunks, then lines,
+* then (page_number, write) events - so only one chunk is held in memory at a
+* time however long the trace is, and the input is read exactly once. Plain
+* text, gzipped text and stdin ("-") are all accepted; gzip is detected from
+* the stream's magic bytes rather than the file name.
+*
+* For bulk loading, read_batches decodes whole blocks of lines at once into
+* NumPy page and write arrays, falling back to the line parser only for
+* blocks the vectorised decoder can't handle.
+*
+'''
+import gzip
+import io
+import sys
+
+import numpy as np
+
+GZIP_MAGIC = b"\x1f\x8b"
+CHUNK_SIZE = 1 << 20  # bytes read from the input per chunk
+STDIN_NAME = "-"
+DEFAULT_PAGE_SIZE = 4096  # bytes, 2^12
+ADDRESS_PAGE_SIZE = 1  # a one-byte page leaves every address as it is, to decode raw addresses
+MAX_ADDRESS_DIGITS = 16  # hex digits in a 64-bit address
+
+# Value of each byte as a hex digit, or -1 if it isn't one
+HEX_DIGITS = np.full(256, -1, dtype=np.int8)
+HEX_DIGITS[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+HEX_DIGITS[np.frombuffer(b"abcdef", dtype=np.uint8)] = np.arange(10, 16)
+HEX_DIGITS[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+
+
+class TraceFormatError(ValueError):
+    def __init__(self, line_number):
+        super().__init__(f"Badly formatted file. Error on line {line_number}")
+        self.line_number = line_number
+
+
+# Opens a trace for binary buffered reading. Raises FileNotFoundError if the file doesn't exist
+def open_trace(path):
+    if path == STDIN_NAME:
+        return io.BufferedReader(sys.stdin.buffer)
+
+    return open(path, "rb")
+
+
+# Returns the first bytes of a buffered stream without consuming them
+def peek_magic(stream, length):
+    return stream.peek(length)[:length]
+
+
+def read_chunks(stream, chunk_size=CHUNK_SIZE):
+    if peek_magic(stream, len(GZIP_MAGIC)) == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+
+    while True:
+        chunk = stream.read(chunk_size)
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def split_lines(chunks):
+    partial = b""
+
+    for chunk in chunks:
+        lines = (partial + chunk).split(b"\n")
+        # The last piece may be cut off mid-line, so carry it into the next chunk
+        partial = lines.pop()
+
+        yield from lines
+
+    if partial:
+        yield partial
+
+
+# Number of address bits inside a page, e.g. 12 for 4KB pages
+def page_offset_for(page_size):
+    if page_size < 1 or page_size & (page_size - 1) != 0:
+        raise ValueError(f"Page size must be a power of two, got {page_size}")
+
+    return page_size.bit_length() - 1
+
+
+# Yields (page_number, write) for each access. Blank lines are skipped
+def parse_events(lines, page_offset, first_line=1):
+    for line_number, trace_line in enumerate(lines, start=first_line):
+        trace_cmd = trace_line.split()
+
+        if len(trace_cmd) == 0:
+            continue
+
+        try:
+            logical_address = int(trace_cmd[0], 16)
+        except ValueError:
+            raise TraceFormatError(line_number) from None
+
+        if len(trace_cmd) != 2 or trace_cmd[1] not in (b"R", b"W"):
+            raise TraceFormatError(line_number)
+
+        # Page arrays are unsigned 64-bit, so anything else is rejected rather than overflowing them
+        if not 0 <= logical_address < 1 << 64:
+            raise TraceFormatError(line_number)
+
+        yield logical_address >> page_offset, trace_cmd[1] == b"W"
+
+
+def stream_events(stream, page_offset, chunk_size=CHUNK_SIZE):
+    return parse_events(split_lines(read_chunks(stream, chunk_size)), page_offset)
+
+
+# Yields blocks of whole, newline-terminated lines, each roughly chunk_size bytes
+def read_blocks(stream, chunk_size=CHUNK_SIZE):
+    partial = b""
+
+    for chunk in read_chunks(stream, chunk_size):
+        block = partial + chunk
+        split_at = block.rfind(b"\n") + 1
+        partial = block[split_at:]
+
+        if split_at > 0:
+            yield block[:split_at]
+
+    if partial:
+        yield partial + b"\n"
+
+
+# Decodes a block of complete, newline-terminated lines into (pages, writes) arrays.
+# first_line is the line number of the block's first line, used in error messages
+def decode_block(block, page_offset, first_line=1):
+    data = np.frombuffer(block, dtype=np.uint8)
+    data = data[data != ord("\r")]
+
+    line_ends = np.flatnonzero(data == ord("\n"))
+    line_starts = np.empty_like(line_ends)
+    line_starts[0:1] = 0
+    line_starts[1:] = line_ends[:-1] + 1
+
+    # Drop blank lines
+    filled = line_ends > line_starts
+    line_starts = line_starts[filled]
+    line_ends = line_ends[filled]
+
+    # Every line should be "<hex address> <R|W>", so the command is the last byte and
+    # the address runs from the start of the line up to the separating space
+    commands = data[line_ends - 1]
+    address_lengths = line_ends - 2 - line_starts
+
+    well_formed = (
+        (address_lengths >= 1)
+        & (address_lengths <= MAX_ADDRESS_DIGITS)
+        & (data[np.maximum(line_ends - 2, 0)] == ord(" "))
+        & ((commands == ord("R")) | (commands == ord("W")))
+    )
+
+    if not well_formed.all():
+        return _decode_block_by_line(block, page_offset, first_line)
+
+    # Gather every address digit, weighting each by its place value within its line
+    field_offsets = np.zeros(len(address_lengths), dtype=np.int64)
+    np.cumsum(address_lengths[:-1], out=field_offsets[1:])
+
+    digit_lines = np.repeat(np.arange(len(address_lengths)), address_lengths)
+    digit_index = np.arange(len(digit_lines)) - field_offsets[digit_lines]
+    digits = HEX_DIGITS[data[line_starts[digit_lines] + digit_index]]
+
+    if (digits < 0).any():
+        return _decode_block_by_line(block, page_offset, first_line)
+
+    place = (address_lengths[digit_lines] - 1 - digit_index) * 4
+    values = digits.astype(np.uint64) << place.astype(np.uint64)
+
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=bool)
+
+    addresses = np.add.reduceat(values, field_offsets)
+    pages = addresses >> np.uint64(page_offset)
+
+    return pages, commands == ord("W")
+
+
+# Slow path for blocks with irregular whitespace, which also pinpoints the bad line, if any
+def _decode_block_by_line(block, page_offset, first_line):
+    events = list(parse_events(block.split(b"\n")[:-1], page_offset, first_line))
+
+    pages = np.array([page_number for page_number, _ in events], dtype=np.uint64)
+    writes = np.array([write for _, write in events], dtype=bool)
+
+    return pages, writes
+
+
+# Yields a (pages, writes) pair of arrays for each block of the stream
+def read_batches(stream, page_offset, chunk_size=CHUNK_SIZE):
+    first_line = 1
+
+    for block in read_blocks(stream, chunk_size):
+        yield decode_block(block, page_offset, first_line)
+
+        first_line += block.count(b"\n")
+
+
+# Decodes a whole trace file into a page number array and a write mask
+def load_pages(path, page_size=DEFAULT_PAGE_SIZE):
+    page_offset = page_offset_for(page_size)
+
+    with open_trace(path) as stream:
+        batches = list(read_batches(stream, page_offset))
+
+    if not batches:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=bool)
+
+    pages = np.concatenate([pages for pages, _ in batches])
+    writes = np.concatenate([writes for _, writes in batches])
+
+    return pages, writes
@@ -0,0 +1,144 @@
+from collections import OrderedDict
+
+from mmu import MMU, free_frame_stack, to_list
+
+RECENT_FRACTION = 0.25  # share of the frames given to A1in, as suggested by Johnson & Shasha
+GHOST_FRACTION = 0.5  # pages remembered in A1out, as a share of the frame count
+
+
+# Full 2Q (Johnson & Shasha). A page seen for the first time goes into A1in, a FIFO, and
+# only moves to the main LRU queue Am if it's referenced again after leaving A1in, while its
+# number is still remembered in A1out. Pages touched once, as in a scan, never reach Am
+class TwoQMMU(MMU):
+    def __init__(self, frames):
+        self.frames = frames
+        self.page_table = [None] * frames
+        self.dirty_bits = [0] * frames
+
+        self.recent_limit = max(1, int(frames * RECENT_FRACTION))
+        self.ghost_limit = max(1, int(frames * GHOST_FRACTION))
+
+        # Resident pages mapped to their frame, oldest (A1in) or least recently used (Am) first
+        self.recent = OrderedDict()  # A1in
+        self.main = OrderedDict()  # Am
+        # Pages recently evicted from A1in, oldest first
+        self.ghosts = OrderedDict()  # A1out
+
+        self.free_frames = free_frame_stack(frames)
+
+        self.logical_time = 0
+
+        self.total_disk_reads = 0
+        self.total_disk_writes = 0
+        self.total_page_faults = 0
+
+        self.debug_mode = False
+
+    def set_debug(self):
+        self.debug_mode = True
+
+    def reset_debug(self):
+        self.debug_mode = False
+
+    # Returns a free frame, or one reclaimed from the tail of A1in (remembering the page in
+    # A1out) once A1in is over its share, or else from the LRU end of Am
+    def __get_replaceable_frame(self):
+        if self.free_frames:
+            return self.free_frames.pop()
+
+        if len(self.recent) > self.recent_limit or not self.main:
+            page_number, frame_num = self.recent.popitem(last=False)
+            self.ghosts[page_number] = None
+
+            if len(self.ghosts) > self.ghost_limit:
+                self.ghosts.popitem(last=False)
+        else:
+            _, frame_num = self.main.popitem(last=False)
+
+        self._write_back(frame_num)
+
+        return frame_num
+
+    # Simulates reading from page page_number, and writing to page_number if write is true
+    def __get_page(self, page_number, write):
+        self.logical_time += 1
+
+        # A hit in A1in leaves the page where it is, a hit in Am makes it most recently used
+        frame_num = self.recent.get(page_number)
+
+        if frame_num is None:
+            frame_num = self.main.get(page_number)
+
+            if frame_num is not None:
+                self.main.move_to_end(page_number)
+
+        if frame_num is not None:
+            if write:
+                self.dirty_bits[frame_num] = 1
+
+            return
+
+        self.__load_page(page_number, write)
+
+    def __load_page(self, page_number, write):
+        frame_num = self.__get_replaceable_frame()
+
+        if self.debug_mode:
+            self._log_debug_message(
+                f"Replacing page {self.page_table[frame_num]} (frame {frame_num}) with page {page_number}..."
+            )
+
+        self.total_disk_reads += 1
+        self.total_page_faults += 1
+
+        self.page_table[frame_num] = page_number
+
+        # Referenced again soon after leaving A1in, so the page has proven itself
+        if page_number in self.ghosts:
+            del self.ghosts[page_number]
+            self.main[page_number] = frame_num
+        else:
+            self.recent[page_number] = frame_num
+
+        if write:
+            self.dirty_bits[frame_num] = 1
+
+    def process_batch(self, pages, writes):
+        recent = self.recent
+        main = self.main
+        dirty_bits = self.dirty_bits
+        logical_time = self.logical_time
+
+        for page_number, write in zip(to_list(pages), to_list(writes)):
+            logical_time += 1
+            frame_num = recent.get(page_number)
+
+            if frame_num is None:
+                frame_num = main.get(page_number)
+
+                if frame_num is None:
+                    self.logical_time = logical_time
+                    self.__load_page(page_number, write)
+                    continue
+
+                main.move_to_end(page_number)
+
+            if write:
+                dirty_bits[frame_num] = 1
+
+        self.logical_time = logical_time
+
+    def read_memory(self, page_number):
+        self.__get_page(page_number=page_number, write=False)
+
+    def write_memory(self, page_number):
+        self.__get_page(page_number=page_number, write=True)
+
+    def get_total_disk_reads(self):
+        return self.total_disk_reads
+
+    def get_total_disk_writes(self):
+        return self.total_disk_writes
+
+    def get_total_page_faults(self):
+        return self.total_page_faults